@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Google API密钥加载 - 从环境变量读取全部已配置的密钥
+"""
+
+import os
+import re
+from typing import Callable, List, Optional
+
+# 分别配置的API密钥：GOOGLE_API_KEY_2、GOOGLE_API_KEY_3 ...（编号从2开始，不含前导零）
+NUMBERED_KEY_PATTERN = re.compile(r'^GOOGLE_API_KEY_([2-9]|[1-9]\d+)$')
+
+
+def load_api_keys(progress_callback: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    从环境变量中读取多个API密钥（支持多种格式）
+    
+    Args:
+        progress_callback: 进度回调，用于报告加载到的密钥
+    
+    Returns:
+        List[API密钥]，未配置任何密钥时为空列表
+    """
+    progress_callback = progress_callback or (lambda msg: None)
+    api_keys = []
+    
+    # 方法1：优先检查批量配置（支持换行+逗号混合分隔）
+    batch_keys = os.environ.get('GOOGLE_API_KEYS')
+    if batch_keys:
+        # 使用换行和逗号混合分隔的批量配置
+        # 先按换行分割，再按逗号分割，然后合并
+        keys_list = []
+        for line in batch_keys.split('\n'):
+            if line.strip():
+                # 对每行按逗号分割
+                line_keys = [key.strip() for key in line.split(',') if key.strip()]
+                keys_list.extend(line_keys)
+        
+        for idx, key in enumerate(keys_list, 1):
+            api_keys.append(key)
+            progress_callback(f"🔑 加载批量API密钥 #{idx}: {key[:10]}...")
+    else:
+        # 方法2：检查GOOGLE_API_KEY是否包含多个密钥（逗号分隔）
+        default_key = os.environ.get('GOOGLE_API_KEY')
+        if default_key:
+            # 检查是否包含逗号（多个API密钥）
+            if ',' in default_key:
+                # 按逗号分割多个密钥
+                key_list = [key.strip() for key in default_key.split(',') if key.strip()]
+                for idx, key in enumerate(key_list, 1):
+                    api_keys.append(key)
+                    progress_callback(f"🔑 加载API密钥 #{idx}: {key[:10]}...")
+            else:
+                # 单个密钥
+                api_keys.append(default_key)
+                progress_callback(f"🔑 加载默认API密钥: {default_key[:10]}...")
+        
+        # 方法3：传统的分别配置方式（GOOGLE_API_KEY_2等），按编号排序，允许编号不连续
+        numbered_keys = sorted(
+            (int(match.group(1)), value)
+            for name, value in os.environ.items()
+            if value and (match := NUMBERED_KEY_PATTERN.match(name))
+        )
+        for i, api_key in numbered_keys:
+            api_keys.append(api_key)
+            progress_callback(f"🔑 加载API密钥 #{i}: {api_key[:10]}...")
+    
+    return api_keys
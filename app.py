@@ -12,6 +12,7 @@ from markupsafe import Markup
 from cross_validator import CrossValidator
 from dotenv import load_dotenv
 from database_manager import DatabaseManager, TaskInfo, TaskLog
+from api_keys import load_api_keys
 
 # 加载.env文件
 load_dotenv()
@@ -200,52 +201,7 @@ def run_analysis_task(task_id, zip_path, excel_path):
         progress_callback("🚀 准备开始处理...")
         
         # 配置API密钥（支持多个API密钥轮询）
-        api_keys = []
-        
-        # 从环境变量中读取多个API密钥（支持多种格式）
-        
-        # 方法1：优先检查批量配置（支持换行+逗号混合分隔）
-        batch_keys = os.environ.get('GOOGLE_API_KEYS')
-        if batch_keys:
-            # 使用换行和逗号混合分隔的批量配置
-            # 先按换行分割，再按逗号分割，然后合并
-            keys_list = []
-            for line in batch_keys.split('\n'):
-                if line.strip():
-                    # 对每行按逗号分割
-                    line_keys = [key.strip() for key in line.split(',') if key.strip()]
-                    keys_list.extend(line_keys)
-            
-            for idx, key in enumerate(keys_list, 1):
-                api_keys.append(key)
-                progress_callback(f"🔑 加载批量API密钥 #{idx}: {key[:10]}...")
-        else:
-            # 方法2：检查GOOGLE_API_KEY是否包含多个密钥（逗号分隔）
-            default_key = os.environ.get('GOOGLE_API_KEY')
-            if default_key:
-                # 检查是否包含逗号（多个API密钥）
-                if ',' in default_key:
-                    # 按逗号分割多个密钥
-                    key_list = [key.strip() for key in default_key.split(',') if key.strip()]
-                    for idx, key in enumerate(key_list, 1):
-                        api_keys.append(key)
-                        progress_callback(f"🔑 加载API密钥 #{idx}: {key[:10]}...")
-                else:
-                    # 单个密钥
-                    api_keys.append(default_key)
-                    progress_callback(f"🔑 加载默认API密钥: {default_key[:10]}...")
-            
-            # 方法3：传统的分别配置方式（GOOGLE_API_KEY_2等）
-            i = 2
-            while True:
-                key_name = f'GOOGLE_API_KEY_{i}'
-                api_key = os.environ.get(key_name)
-                if not api_key:
-                    break  # 没有更多密钥时停止
-                
-                api_keys.append(api_key)
-                progress_callback(f"🔑 加载API密钥 #{i}: {api_key[:10]}...")
-                i += 1
+        api_keys = load_api_keys(progress_callback)
         
         # 检查是否找到任何API密钥
         if not api_keys:
@@ -12,6 +12,38 @@ from datetime import timedelta
 # Redis连接配置
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Redis代理的优先级子队列划分：每个优先级一个列表（0-10）
+BROKER_PRIORITY_STEPS = list(range(11))
+# 优先级子队列键名分隔符（kombu默认值）
+BROKER_PRIORITY_SEP = '\x06\x16'
+
+# 序列化格式：安装msgpack时使用msgpack，否则回退到json（两种格式均可接收）
+try:
+    import msgpack
+    from kombu.serialization import register
+    
+    def _msgpack_dumps(value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def _msgpack_loads(data: bytes):
+        # msgpack>=1.0默认只允许字符串/字节作为映射键；交叉验证数据含整数键的字典
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    
+    # 覆盖kombu内置的msgpack编解码器（同名注册即替换）
+    register('msgpack', _msgpack_dumps, _msgpack_loads,
+             content_type='application/x-msgpack', content_encoding='binary')
+    SERIALIZER = 'msgpack'
+except ImportError:
+    SERIALIZER = 'json'
+
+# 未确认消息的重新投递时间（秒）：acks_late下任务硬超时必须小于该值，否则运行中即被重投
+BROKER_VISIBILITY_TIMEOUT = 3600
+
+def broker_queue_keys(queue: str) -> list:
+    """队列在代理Redis中对应的全部列表键（优先级0使用队列名本身）"""
+    return [f"{queue}{BROKER_PRIORITY_SEP}{step}" if step else queue
+            for step in BROKER_PRIORITY_STEPS]
+
 # 创建Celery应用
 celery_app = Celery('pdf_processor')
 
@@ -21,10 +53,27 @@ celery_app.conf.update(
     broker_url=REDIS_URL,
     result_backend=REDIS_URL,
     
-    # 任务序列化
-    task_serializer='json',
-    result_serializer='json',
-    accept_content=['json'],
+    # Redis代理传输参数：空闲时由BRPOP在服务端阻塞等待，无需调整轮询间隔
+    # （kombu会用polling_interval作为BRPOP超时，过小会让空闲worker频繁往返）
+    broker_transport_options={
+        'visibility_timeout': BROKER_VISIBILITY_TIMEOUT,  # 需大于任务硬超时
+        'priority_steps': BROKER_PRIORITY_STEPS,
+        'sep': BROKER_PRIORITY_SEP,
+        'queue_order_strategy': 'priority',
+    },
+    
+    # 结果后端连接出错时的重试策略，避免等待结果的调用长时间挂起
+    result_backend_transport_options={
+        'retry_policy': {'timeout': 5.0},
+    },
+    
+    # 任务序列化：优先msgpack（体积更小），并对任务消息做gzip压缩以减少Redis内存与带宽；
+    # 结果后端不支持压缩，大体积参数由 tasks.offload_payload 存入Redis后只传引用
+    task_serializer=SERIALIZER,
+    result_serializer=SERIALIZER,
+    accept_content=['msgpack', 'json'],
+    result_accept_content=['msgpack', 'json'],
+    task_compression='gzip',
     
     # 时区设置
     timezone='Asia/Shanghai',
@@ -43,6 +92,11 @@ celery_app.conf.update(
         'pdf_processor.tasks.extract_pdf_content': {'queue': 'pdf_extraction'},
         'pdf_processor.tasks.cross_validate_materials': {'queue': 'validation'},
         'pdf_processor.tasks.process_single_file': {'queue': 'file_processing'},
+        'pdf_processor.tasks.batch_process_files': {'queue': 'file_processing'},
+        'pdf_processor.tasks.finalize_batch': {'queue': 'file_processing'},
+        'pdf_processor.tasks.process_file_chunk': {'queue': 'file_processing'},
+        'pdf_processor.tasks.collect_wave': {'queue': 'file_processing'},
+        'pdf_processor.tasks.finalize_waves': {'queue': 'file_processing'},
     },
     
     # 定义队列和优先级
@@ -7,27 +7,160 @@ import logging
 import time
 import psutil
 import os
-from typing import Dict, List, Any, Optional, Tuple
-from collections import defaultdict, deque
-from threading import Lock
+import socket
+import numpy as np
+from dataclasses import dataclass, asdict
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Tuple, Sequence
+from collections import defaultdict
+from threading import Lock, Thread
 import redis
+
 try:
-    from .celery_app import celery_app
+    from .celery_app import broker_queue_keys
 except ImportError:
-    from celery_app import celery_app
+    # 直接运行时使用绝对导入
+    from celery_app import broker_queue_keys
 
 logger = logging.getLogger(__name__)
 
+# 任务类型 -> 候选队列（只读分发表）
+_QUEUE_MAPPING = MappingProxyType({
+    'pdf_extraction': ('pdf_extraction', 'file_processing'),
+    'file_processing': ('file_processing', 'pdf_extraction'),
+    'cross_validation': ('validation', 'file_processing'),
+    'generic': ('file_processing', 'validation')
+})
+_DEFAULT_CANDIDATES = ('file_processing',)
+
+# Redis连接池配置：保持长连接，避免空闲后重新握手
+_REDIS_POOL_OPTIONS = MappingProxyType({
+    'max_connections': 32,
+    'health_check_interval': 30,
+})
+# TCP keepalive参数（仅部分平台支持这些常量）
+_TCP_KEEPALIVE_OPTIONS = MappingProxyType({
+    getattr(socket, name): value
+    for name, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 30), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, name)
+})
+
+# 需要统计长度的队列，以及一次往返读取全部长度的Lua脚本
+# 每个队列在代理中按优先级拆成多个列表键，长度需按队列求和
+_MONITORED_QUEUES = ('pdf_extraction', 'file_processing', 'validation')
+_QUEUE_KEY_GROUPS = tuple(tuple(broker_queue_keys(queue)) for queue in _MONITORED_QUEUES)
+_QUEUE_LENGTH_KEYS = tuple(key for keys in _QUEUE_KEY_GROUPS for key in keys)
+_QUEUE_LENGTHS_LUA = """
+local r = {}
+for i, k in ipairs(KEYS) do
+    r[i] = redis.call('LLEN', k)
+end
+return r
+"""
+
+# (任务类型, 队列) -> 类型适配加分
+_TYPE_BONUS = MappingProxyType({
+    ('pdf_extraction', 'pdf_extraction'): 20,
+    ('cross_validation', 'validation'): 20
+})
+
+# 任务类型 -> 基础优先级
+_BASE_PRIORITY = MappingProxyType({
+    'pdf_extraction': 7,
+    'file_processing': 5,
+    'cross_validation': 3,
+    'generic': 4
+})
+
+# 资源采样失败时使用的默认负载
+_DEFAULT_SYSTEM_LOAD = MappingProxyType({
+    'cpu_percent': 50.0,
+    'memory_percent': 50.0,
+    'memory_available_mb': 1000.0,
+    'process_memory_mb': 100.0,
+    'load_average': 1.0
+})
+
+# 任务类型 -> 基础批大小
+_BASE_BATCH_SIZES = MappingProxyType({
+    'pdf_extraction': 3,
+    'file_processing': 5,
+    'cross_validation': 2,
+    'generic': 4
+})
+
+# 任务历史环形缓冲区容量及记录结构
+_HISTORY_CAPACITY = 1000
+_HISTORY_DTYPE = np.dtype([
+    ('ts', 'i8'),   # 完成时间（time.monotonic_ns，不受系统时钟调整影响）
+    ('tt', 'u1'),   # 任务类型编码，见 _TASK_TYPE_CODES
+    ('et', 'f4'),   # 执行耗时（秒）
+    ('ok', 'u1'),   # 是否成功
+])
+_TASK_TYPES = ('generic', 'pdf_extraction', 'file_processing', 'cross_validation')
+_TASK_TYPE_CODES = MappingProxyType({name: code for code, name in enumerate(_TASK_TYPES)})
+
+@dataclass(slots=True)
+class QueueStats:
+    """单个队列的累计执行统计"""
+    total_tasks: int = 0
+    success_count: int = 0
+    total_time: float = 0.0
+    avg_time: float = 0.0
+
+class _TaskHistoryRing:
+    """
+    定长任务历史环形缓冲区
+    
+    用结构化numpy数组代替逐条dict，写满后覆盖最旧记录；
+    有效记录为逻辑下标 [start, end)，物理位置为 下标 % capacity。
+    """
+    
+    __slots__ = ('buf', 'start', 'end')
+    
+    def __init__(self, capacity: int = _HISTORY_CAPACITY):
+        self.buf = np.zeros(capacity, dtype=_HISTORY_DTYPE)
+        self.start = 0
+        self.end = 0
+    
+    def __len__(self) -> int:
+        return self.end - self.start
+    
+    def append(self, timestamp: int, task_type: str, execution_time: float, success: bool):
+        """追加一条记录，超出容量时自动淘汰最旧记录"""
+        capacity = len(self.buf)
+        self.buf[self.end % capacity] = (
+            timestamp, _TASK_TYPE_CODES.get(task_type, 0), execution_time, success
+        )
+        self.end += 1
+        if self.end - self.start > capacity:
+            self.start = self.end - capacity
+    
+    def records(self) -> np.ndarray:
+        """按时间顺序返回有效记录（副本）"""
+        index = np.arange(self.start, self.end) % len(self.buf)
+        return self.buf[index]
+    
+    def evict_before(self, cutoff: int):
+        """从最旧端淘汰时间戳早于cutoff的连续记录"""
+        if not len(self):
+            return
+        alive = self.records()['ts'] >= cutoff
+        # 第一条未过期记录之前的全部淘汰；全部过期时清空
+        self.start += int(alive.argmax()) if alive.any() else len(alive)
+
 class LoadBalancer:
     """智能负载均衡器"""
     
     def __init__(self, redis_url: str = None):
         self.redis_url = redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379/0')
         self.redis_client = None
+        self._queue_lengths_script = None
         self._worker_stats = defaultdict(dict)
-        self._queue_stats = defaultdict(dict)
-        self._task_history = defaultdict(deque)  # 任务执行历史
-        self._stats_lock = Lock()
+        self._queue_stats: Dict[str, QueueStats] = defaultdict(QueueStats)
+        self._task_history: Dict[str, _TaskHistoryRing] = defaultdict(_TaskHistoryRing)  # 任务执行历史
+        self._queue_locks: Dict[str, Lock] = {}  # 按队列分片的统计锁
+        self._stats_lock = Lock()  # 仅保护分片锁的创建
         
         # 负载均衡配置
         self.max_queue_length = 100
@@ -43,13 +176,35 @@ class LoadBalancer:
             'generic': 1.0           # 通用任务基础权重
         }
         
+        # 后台资源采样：请求路径只读取最新快照，不再触发psutil调用
+        self.sample_interval = 0.5  # 秒
+        self._latest_load: Dict[str, float] = dict(_DEFAULT_SYSTEM_LOAD)
+        self._sampler_thread: Optional[Thread] = None
+        self._queue_loads_unavailable_logged = False
+        # 内核每5秒才更新一次loadavg，采样线程按该周期缓存
+        self.loadavg_ttl = 5.0  # 秒
+        self._loadavg_cache = 0.0
+        self._loadavg_refreshed_at = 0.0
+        
         self._init_redis_connection()
+        self._start_sampler()
     
     def _init_redis_connection(self):
         """初始化Redis连接"""
         try:
-            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            options = dict(_REDIS_POOL_OPTIONS)
+            if not self.redis_url.startswith('unix://'):
+                # unix socket 连接不经过TCP，不接受keepalive参数
+                options.update(
+                    socket_keepalive=True,
+                    socket_keepalive_options=dict(_TCP_KEEPALIVE_OPTIONS)
+                )
+            self.redis_client = redis.Redis.from_url(
+                self.redis_url, decode_responses=True, **options
+            )
             self.redis_client.ping()
+            # register_script 通过EVALSHA调用，遇到NOSCRIPT时自动重新加载
+            self._queue_lengths_script = self.redis_client.register_script(_QUEUE_LENGTHS_LUA)
             logger.info("Redis连接初始化成功")
         except Exception as e:
             logger.warning(f"Redis连接失败: {e}")
@@ -88,38 +243,56 @@ class LoadBalancer:
         logger.debug(f"为任务类型 {task_type} 选择队列 {optimal_queue}，优先级 {priority}")
         return optimal_queue, priority
     
-    def _get_system_load(self) -> Dict[str, float]:
-        """获取系统负载信息"""
+    def _start_sampler(self):
+        """启动后台资源采样线程"""
+        self._sampler_thread = Thread(
+            target=self._sample_loop, name='load-balancer-sampler', daemon=True
+        )
+        self._sampler_thread.start()
+    
+    def _sample_loop(self):
+        """按固定间隔采样系统负载，并整体替换快照引用"""
+        # 首次调用仅用于建立CPU统计基线
+        psutil.cpu_percent(interval=None)
+        while True:
+            time.sleep(self.sample_interval)
+            self._latest_load = self._sample_system_load()
+    
+    def _sample_system_load(self) -> Dict[str, float]:
+        """采集一次系统负载信息（仅在后台线程中调用）"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
             
             # 获取进程信息
             current_process = psutil.Process()
             process_memory = current_process.memory_info().rss / 1024 / 1024  # MB
             
-            load_info = {
+            return {
                 'cpu_percent': cpu_percent,
                 'memory_percent': memory.percent,
                 'memory_available_mb': memory.available / 1024 / 1024,
-                'disk_percent': disk.percent,
                 'process_memory_mb': process_memory,
-                'load_average': os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0.0
+                'load_average': self._get_load_average()
             }
             
-            return load_info
-            
         except Exception as e:
             logger.warning(f"获取系统负载失败: {e}")
-            return {
-                'cpu_percent': 50.0,
-                'memory_percent': 50.0,
-                'memory_available_mb': 1000.0,
-                'disk_percent': 50.0,
-                'process_memory_mb': 100.0,
-                'load_average': 1.0
-            }
+            return dict(_DEFAULT_SYSTEM_LOAD)
+    
+    def _get_load_average(self) -> float:
+        """获取1分钟平均负载，结果按loadavg_ttl缓存"""
+        if not hasattr(os, 'getloadavg'):
+            return 0.0
+        now = time.monotonic()
+        if now - self._loadavg_refreshed_at >= self.loadavg_ttl:
+            self._loadavg_cache = os.getloadavg()[0]
+            self._loadavg_refreshed_at = now
+        return self._loadavg_cache
+    
+    def _get_system_load(self) -> Dict[str, float]:
+        """获取系统负载信息（后台采样的最新快照，调用方不得修改）"""
+        return self._latest_load
     
     def _get_queue_loads(self) -> Dict[str, int]:
         """获取各队列当前负载"""
@@ -127,40 +300,33 @@ class LoadBalancer:
         
         try:
             if self.redis_client:
-                # 从Redis获取队列长度
-                queues = ['pdf_extraction', 'file_processing', 'validation']
-                for queue in queues:
-                    length = self.redis_client.llen(f'celery_queue_{queue}')
-                    queue_loads[queue] = length
-            else:
-                # 使用Celery inspect获取队列信息
-                inspect = celery_app.control.inspect()
-                active_tasks = inspect.active()
-                scheduled_tasks = inspect.scheduled()
-                
-                if active_tasks and scheduled_tasks:
-                    for worker, tasks in active_tasks.items():
-                        for task in tasks:
-                            queue = task.get('delivery_info', {}).get('routing_key', 'default')
-                            queue_loads[queue] = queue_loads.get(queue, 0) + 1
+                # 一次往返读取全部队列长度，得到一致的快照
+                try:
+                    lengths = self._queue_lengths_script(keys=_QUEUE_LENGTH_KEYS)
+                except redis.exceptions.ResponseError:
+                    # 服务端禁用脚本时退回到pipeline，同样只需一次往返
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    for key in _QUEUE_LENGTH_KEYS:
+                        pipe.llen(key)
+                    lengths = pipe.execute()
+                lengths = iter(map(int, lengths))
+                for queue_name, keys in zip(_MONITORED_QUEUES, _QUEUE_KEY_GROUPS):
+                    queue_loads[queue_name] = sum(next(lengths) for _ in keys)
+            elif not self._queue_loads_unavailable_logged:
+                # 不回退到Celery inspect广播（每次需等待所有worker超时），直接返回空负载
+                logger.warning("Redis不可用，队列负载按空队列处理")
+                self._queue_loads_unavailable_logged = True
         
         except Exception as e:
             logger.warning(f"获取队列负载失败: {e}")
         
         return queue_loads
     
-    def _get_candidate_queues(self, task_type: str) -> List[str]:
+    def _get_candidate_queues(self, task_type: str) -> Tuple[str, ...]:
         """根据任务类型获取候选队列"""
-        queue_mapping = {
-            'pdf_extraction': ['pdf_extraction', 'file_processing'],
-            'file_processing': ['file_processing', 'pdf_extraction'],
-            'cross_validation': ['validation', 'file_processing'],
-            'generic': ['file_processing', 'validation']
-        }
-        
-        return queue_mapping.get(task_type, ['file_processing'])
+        return _QUEUE_MAPPING.get(task_type, _DEFAULT_CANDIDATES)
     
-    def _select_best_queue(self, candidate_queues: List[str], 
+    def _select_best_queue(self, candidate_queues: Sequence[str], 
                           queue_loads: Dict[str, int],
                           system_load: Dict[str, float],
                           task_type: str) -> str:
@@ -168,41 +334,29 @@ class LoadBalancer:
         if not candidate_queues:
             return 'file_processing'  # 默认队列
         
-        # 计算每个队列的负载分数
-        queue_scores = {}
+        # 检查资源限制
+        if self._is_system_overloaded(system_load):
+            # 系统负载过高，选择最轻量的队列
+            return min(candidate_queues, key=lambda q: queue_loads.get(q, 0))
+        
+        # 系统资源因子与队列无关，循环外只计算一次
+        cpu_score = max(0, 100 - system_load['cpu_percent'])
+        memory_score = max(0, 100 - system_load['memory_percent'])
+        resource_score = cpu_score * 0.3 + memory_score * 0.2
         
+        # 单次遍历计算负载分数，直接追踪最高分队列
+        best_queue, best_score = candidate_queues[0], -1.0
         for queue in candidate_queues:
-            score = 0.0
-            
             # 队列长度因子（越短越好）
-            queue_length = queue_loads.get(queue, 0)
-            length_score = max(0, 100 - queue_length * 2)
-            
-            # 系统资源因子
-            cpu_score = max(0, 100 - system_load['cpu_percent'])
-            memory_score = max(0, 100 - system_load['memory_percent'])
+            length_score = max(0, 100 - queue_loads.get(queue, 0) * 2)
             
             # 任务类型适配度
-            type_bonus = 0
-            if (task_type == 'pdf_extraction' and queue == 'pdf_extraction') or \
-               (task_type == 'cross_validation' and queue == 'validation'):
-                type_bonus = 20
+            type_bonus = _TYPE_BONUS.get((task_type, queue), 0)
             
             # 综合评分
-            score = (length_score * 0.4 + 
-                    cpu_score * 0.3 + 
-                    memory_score * 0.2 + 
-                    type_bonus * 0.1)
-            
-            queue_scores[queue] = score
-        
-        # 选择分数最高的队列
-        best_queue = max(queue_scores.items(), key=lambda x: x[1])[0]
-        
-        # 检查资源限制
-        if self._is_system_overloaded(system_load):
-            # 系统负载过高，选择最轻量的队列
-            return min(candidate_queues, key=lambda q: queue_loads.get(q, 0))
+            score = length_score * 0.4 + resource_score + type_bonus * 0.1
+            if score > best_score:
+                best_queue, best_score = queue, score
         
         return best_queue
     
@@ -211,12 +365,7 @@ class LoadBalancer:
                                   queue_length: int) -> int:
         """计算动态优先级"""
         # 基础优先级
-        base_priority = {
-            'pdf_extraction': 7,
-            'file_processing': 5,
-            'cross_validation': 3,
-            'generic': 4
-        }.get(task_type, 4)
+        base_priority = _BASE_PRIORITY.get(task_type, 4)
         
         # 根据系统负载调整
         cpu_load = system_load.get('cpu_percent', 50)
@@ -250,14 +399,7 @@ class LoadBalancer:
         system_load = self._get_system_load()
         
         # 基础批大小
-        base_batch_sizes = {
-            'pdf_extraction': 3,
-            'file_processing': 5,
-            'cross_validation': 2,
-            'generic': 4
-        }
-        
-        base_size = base_batch_sizes.get(task_type, 4)
+        base_size = _BASE_BATCH_SIZES.get(task_type, 4)
         
         # 根据系统负载调整
         cpu_load = system_load.get('cpu_percent', 50)
@@ -272,74 +414,75 @@ class LoadBalancer:
         
         return base_size
     
+    def _get_queue_lock(self, queue: str) -> Lock:
+        """获取队列对应的统计锁，不同队列的更新互不阻塞"""
+        lock = self._queue_locks.get(queue)
+        if lock is None:
+            with self._stats_lock:
+                lock = self._queue_locks.setdefault(queue, Lock())
+        return lock
+    
     def record_task_completion(self, task_type: str, queue: str, 
                              execution_time: float, success: bool):
         """记录任务完成情况"""
-        with self._stats_lock:
-            timestamp = time.time()
+        with self._get_queue_lock(queue):
+            timestamp = time.monotonic_ns()
             
             # 更新队列统计
-            if queue not in self._queue_stats:
-                self._queue_stats[queue] = {
-                    'total_tasks': 0,
-                    'success_count': 0,
-                    'total_time': 0.0,
-                    'avg_time': 0.0
-                }
-            
             stats = self._queue_stats[queue]
-            stats['total_tasks'] += 1
+            stats.total_tasks += 1
             if success:
-                stats['success_count'] += 1
-            stats['total_time'] += execution_time
-            stats['avg_time'] = stats['total_time'] / stats['total_tasks']
+                stats.success_count += 1
+            stats.total_time += execution_time
+            stats.avg_time = stats.total_time / stats.total_tasks
             
             # 记录历史
-            self._task_history[queue].append({
-                'timestamp': timestamp,
-                'task_type': task_type,
-                'execution_time': execution_time,
-                'success': success
-            })
-            
-            # 限制历史记录长度
-            if len(self._task_history[queue]) > 1000:
-                self._task_history[queue].popleft()
+            self._task_history[queue].append(timestamp, task_type, execution_time, success)
     
     def get_performance_stats(self) -> Dict[str, Any]:
         """获取性能统计信息"""
-        with self._stats_lock:
-            system_load = self._get_system_load()
-            queue_loads = self._get_queue_loads()
-            
-            return {
-                'system_load': system_load,
-                'queue_loads': queue_loads,
-                'queue_stats': dict(self._queue_stats),
-                'task_history_count': {
-                    queue: len(history) 
-                    for queue, history in self._task_history.items()
-                },
-                'recommendations': {
-                    'throttle_tasks': self.should_throttle_tasks(),
-                    'batch_sizes': {
-                        task_type: self.get_recommended_batch_size(task_type)
-                        for task_type in self.task_weights.keys()
-                    }
+        # 负载采集与Redis查询不持有任何统计锁
+        system_load = self._get_system_load()
+        queue_loads = self._get_queue_loads()
+        
+        # 仅在各队列锁内做快照拷贝
+        queue_stats = {}
+        task_history_count = {}
+        for queue in list(self._queue_locks.keys()):
+            with self._get_queue_lock(queue):
+                stats = self._queue_stats.get(queue)
+                if stats is not None:
+                    queue_stats[queue] = asdict(stats)
+                history = self._task_history.get(queue)
+                if history is not None:
+                    task_history_count[queue] = len(history)
+        
+        return {
+            'system_load': system_load,
+            'queue_loads': queue_loads,
+            'queue_stats': queue_stats,
+            'task_history_count': task_history_count,
+            'recommendations': {
+                'throttle_tasks': self.should_throttle_tasks(),
+                'batch_sizes': {
+                    task_type: self.get_recommended_batch_size(task_type)
+                    for task_type in self.task_weights.keys()
                 }
             }
+        }
     
     def cleanup_old_stats(self, max_age: int = 3600):
         """清理旧的统计数据"""
-        current_time = time.time()
+        cutoff = time.monotonic_ns() - max_age * 1_000_000_000
         
-        with self._stats_lock:
-            for queue in list(self._task_history.keys()):
-                history = self._task_history[queue]
+        for queue in list(self._task_history.keys()):
+            with self._get_queue_lock(queue):
+                history = self._task_history.get(queue)
+                if history is None:
+                    continue
                 
                 # 移除过期记录
-                while history and (current_time - history[0]['timestamp']) > max_age:
-                    history.popleft()
+                history.evict_before(cutoff)
                 
                 # 如果队列为空，删除队列记录
                 if not history:
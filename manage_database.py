@@ -11,12 +11,14 @@ import argparse
 import time
 from datetime import datetime
 from pathlib import Path
-from database_manager import DatabaseManager, TaskInfo, TaskLog
 
 def init_database(db_path=None):
     """初始化数据库"""
     print("🚀 正在初始化数据库...")
     
+    # 延迟导入，避免 --help 等不需要数据库的调用承担加载开销
+    from database_manager import DatabaseManager
+    
     db_manager = DatabaseManager(
         db_path=db_path,
         progress_callback=lambda msg: print(f"[DB] {msg}")
@@ -86,9 +88,15 @@ def export_task(db_manager, task_id, output_dir="exports"):
     
     output_file = output_dir / f"task_{task_id}_{int(time.time())}.json"
     
-    import json
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(task_data, f, ensure_ascii=False, indent=2)
+    try:
+        # orjson为C实现的编码器，大任务导出明显更快，直接写入UTF-8字节
+        import orjson
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(task_data, option=orjson.OPT_INDENT_2))
+    except ImportError:
+        import json
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(task_data, f, ensure_ascii=False, indent=2)
     
     print(f"✅ 任务数据已导出到: {output_file}")
 
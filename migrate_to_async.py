@@ -6,16 +6,71 @@
 
 import re
 import os
+import hashlib
 import logging
-from typing import List, Tuple
+from typing import List, Set
 
 logger = logging.getLogger(__name__)
 
 class AsyncMigrator:
     """异步队列迁移器"""
     
-    def __init__(self):
+    # 预编译的迁移正则，避免每次调用时重复查找/编译
+    _PAT_IMPORT_BLOCK = re.compile(r'(import\s+.*?\n)+')
+    _PAT_TPE = re.compile(r'from concurrent\.futures import ThreadPoolExecutor')
+    _PAT_TPE_AC = re.compile(r'from concurrent\.futures import ThreadPoolExecutor, as_completed')
+    _PAT_CF_IMPORT = re.compile(r'import concurrent\.futures')
+    _PAT_WITH = re.compile(r'with concurrent\.futures\.ThreadPoolExecutor\(max_workers=(\d+)\) as executor:')
+    _PAT_AS_COMPLETED = re.compile(r'concurrent\.futures\.as_completed')
+    _PAT_ASYNC_WITH = re.compile(r'(with AsyncThreadPoolExecutor\(max_workers=(\d+)\) as executor:)')
+    _PAT_INIT = re.compile(r'(def __init__\(self.*?\):.*?\n)', re.DOTALL)
+    # 验证用：一次扫描同时查找三类标记（分组1/2/3）
+    _PAT_VALIDATE = re.compile(
+        r'(AsyncThreadPoolExecutor)|(async_as_completed)|(concurrent\.futures\.ThreadPoolExecutor\()'
+    )
+    
+    # (编译后的模式, 替换文本)
+    _IMPORT_REPLACEMENTS = (
+        (_PAT_TPE,
+         '# from concurrent.futures import ThreadPoolExecutor  # 已替换为异步队列'),
+        (_PAT_TPE_AC,
+         '# from concurrent.futures import ThreadPoolExecutor, as_completed  # 已替换为异步队列'),
+        (_PAT_CF_IMPORT,
+         'import concurrent.futures  # 保留用于类型标注'),
+    )
+    
+    def __init__(self, digest_cache_path: str = '.migrations_cache'):
         self.backup_suffix = '.backup'
+        # 已迁移内容的摘要，内容未变化的文件直接跳过
+        self.digest_cache_path = digest_cache_path
+        self._migrated_digests: Set[str] = self._load_digests()
+    
+    @staticmethod
+    def _content_digest(content: str) -> str:
+        """计算文件内容摘要"""
+        return hashlib.blake2b(content.encode('utf-8')).hexdigest()
+    
+    def _load_digests(self) -> Set[str]:
+        """从旁路缓存文件加载已迁移摘要"""
+        try:
+            with open(self.digest_cache_path, 'r', encoding='utf-8') as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+        except Exception as e:
+            logger.warning(f"读取迁移摘要缓存失败: {e}")
+            return set()
+    
+    def _remember_digest(self, digest: str):
+        """记录摘要并追加写入旁路缓存文件"""
+        if digest in self._migrated_digests:
+            return
+        self._migrated_digests.add(digest)
+        try:
+            with open(self.digest_cache_path, 'a', encoding='utf-8') as f:
+                f.write(digest + '\n')
+        except Exception as e:
+            logger.warning(f"写入迁移摘要缓存失败: {e}")
     
     def migrate_cross_validator(self, file_path: str = 'cross_validator.py') -> bool:
         """
@@ -32,6 +87,11 @@ class AsyncMigrator:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
+            # 内容与某次迁移结果一致，无需重复处理
+            if self._content_digest(content) in self._migrated_digests:
+                logger.info(f"文件已迁移且未变化，跳过: {file_path}")
+                return True
+            
             # 创建备份
             backup_path = file_path + self.backup_suffix
             with open(backup_path, 'w', encoding='utf-8') as f:
@@ -56,6 +116,10 @@ class AsyncMigrator:
     def _perform_migration(self, content: str) -> str:
         """执行具体的迁移操作"""
         
+        # 已迁移过的内容直接返回，避免重复注入导入块
+        if 'ASYNC_QUEUE_AVAILABLE' in content:
+            return content
+        
         # 1. 添加必要的导入
         content = self._add_imports(content)
         
@@ -73,9 +137,6 @@ class AsyncMigrator:
     def _add_imports(self, content: str) -> str:
         """添加异步队列相关导入"""
         
-        # 查找import区域
-        import_pattern = r'(import\s+.*?\n)+'
-        
         # 要添加的导入
         new_imports = """
 # 异步队列系统导入
@@ -98,8 +159,8 @@ except ImportError:
             return match.group(0) + new_imports
         
         # 如果找到导入区域，在其后添加
-        if re.search(import_pattern, content):
-            content = re.sub(import_pattern, add_after_imports, content, count=1)
+        if self._PAT_IMPORT_BLOCK.search(content):
+            content = self._PAT_IMPORT_BLOCK.sub(add_after_imports, content, count=1)
         else:
             # 如果没有找到导入区域，在文件开头添加
             content = new_imports + content
@@ -109,36 +170,30 @@ except ImportError:
     def _replace_imports(self, content: str) -> str:
         """替换ThreadPoolExecutor导入"""
         
-        # 替换concurrent.futures导入
-        patterns = [
-            (r'from concurrent\.futures import ThreadPoolExecutor', 
-             '# from concurrent.futures import ThreadPoolExecutor  # 已替换为异步队列'),
-            (r'from concurrent\.futures import ThreadPoolExecutor, as_completed',
-             '# from concurrent.futures import ThreadPoolExecutor, as_completed  # 已替换为异步队列'),
-            (r'import concurrent\.futures',
-             'import concurrent.futures  # 保留用于类型标注')
-        ]
+        if 'concurrent.futures' not in content:
+            return content
         
-        for pattern, replacement in patterns:
-            content = re.sub(pattern, replacement, content)
+        # 替换concurrent.futures导入
+        for pattern, replacement in self._IMPORT_REPLACEMENTS:
+            content = pattern.sub(replacement, content)
         
         return content
     
     def _replace_thread_pool_usage(self, content: str) -> str:
         """替换ThreadPoolExecutor的使用"""
         
+        if 'concurrent.futures.' not in content and 'AsyncThreadPoolExecutor(' not in content:
+            return content
+        
         # 模式1: with ThreadPoolExecutor(max_workers=N) as executor:
-        pattern1 = r'with concurrent\.futures\.ThreadPoolExecutor\(max_workers=(\d+)\) as executor:'
-        replacement1 = r'with AsyncThreadPoolExecutor(max_workers=\1) as executor:'
-        content = re.sub(pattern1, replacement1, content)
+        content = self._PAT_WITH.sub(
+            r'with AsyncThreadPoolExecutor(max_workers=\1) as executor:', content
+        )
         
         # 模式2: concurrent.futures.as_completed
-        pattern2 = r'concurrent\.futures\.as_completed'
-        replacement2 = 'async_as_completed'
-        content = re.sub(pattern2, replacement2, content)
+        content = self._PAT_AS_COMPLETED.sub('async_as_completed', content)
         
         # 模式3: 添加负载均衡检查
-        pattern3 = r'(with AsyncThreadPoolExecutor\(max_workers=(\d+)\) as executor:)'
         def add_load_balancing(match):
             max_workers = match.group(2)
             return f"""# 检查系统负载并调整工作线程数
@@ -150,16 +205,17 @@ except ImportError:
         
         {match.group(1).replace(max_workers, 'max_workers')}"""
         
-        content = re.sub(pattern3, add_load_balancing, content)
+        content = self._PAT_ASYNC_WITH.sub(add_load_balancing, content)
         
         return content
     
     def _add_queue_checks(self, content: str) -> str:
         """添加队列系统检查"""
         
-        # 在类初始化方法中添加队列检查
-        init_pattern = r'(def __init__\(self.*?\):.*?\n)'
+        if 'def __init__(self' not in content:
+            return content
         
+        # 在类初始化方法中添加队列检查
         def add_queue_init(match):
             return match.group(1) + """
         # 初始化异步队列系统
@@ -170,7 +226,7 @@ except ImportError:
             self._log("使用传统线程池")
 """
         
-        content = re.sub(init_pattern, add_queue_init, content, flags=re.DOTALL)
+        content = self._PAT_INIT.sub(add_queue_init, content)
         
         return content
     
@@ -205,15 +261,22 @@ except ImportError:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
+            # 单次扫描，记录命中的标记分组
+            found = set()
+            for match in self._PAT_VALIDATE.finditer(content):
+                found.add(match.lastindex)
+                if len(found) == 3:
+                    break
+            
             # 检查必要的导入
-            if 'AsyncThreadPoolExecutor' not in content:
+            if 1 not in found:
                 issues.append("缺少AsyncThreadPoolExecutor导入")
             
-            if 'async_as_completed' not in content:
+            if 2 not in found:
                 issues.append("缺少async_as_completed导入")
             
             # 检查是否还有旧的ThreadPoolExecutor使用
-            if re.search(r'concurrent\.futures\.ThreadPoolExecutor\(', content):
+            if 3 in found:
                 issues.append("仍存在旧的ThreadPoolExecutor使用")
             
             # 检查语法
@@ -222,6 +285,10 @@ except ImportError:
             except SyntaxError as e:
                 issues.append(f"语法错误: {e}")
             
+            # 验证通过后才记录摘要，验证失败的迁移下次仍会重新处理
+            if not issues:
+                self._remember_digest(self._content_digest(content))
+            
         except Exception as e:
             issues.append(f"验证过程出错: {e}")
         
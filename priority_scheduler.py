@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+优先级调度器 - 基于Redis有序集合的全局优先级排队
+Celery的Redis代理按优先级拆分为多个列表，同一档位内无法细分先后；
+本调度器先将任务签名放入有序集合，由后台线程按分数从高到低转发给Celery
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from celery import signature
+from celery.result import AsyncResult
+try:
+    from .celery_app import celery_app, broker_queue_keys
+except ImportError:
+    from celery_app import celery_app, broker_queue_keys
+
+logger = logging.getLogger(__name__)
+
+# 分数 = 优先级 * 权重 - 提交时间(毫秒)：优先级高者先出，同优先级先到先出
+_PRIORITY_WEIGHT = 1e13
+
+def _message_count(sig) -> int:
+    """签名发布到代理的消息数：group/chord按子任务计，其余为1"""
+    tasks = getattr(sig, 'tasks', None)
+    return max(1, len(tasks)) if tasks else 1
+
+def _entry_messages(member) -> int:
+    """有序集合条目记录的消息数，无法解析时按1计"""
+    try:
+        return int(json.loads(member).get('messages', 1))
+    except (ValueError, TypeError, AttributeError):
+        return 1
+
+class PriorityScheduler:
+    """Redis有序集合优先级调度器"""
+
+    def __init__(self, queue: str, max_backlog: int = 32, pop_timeout: int = 5):
+        """
+        Args:
+            queue: 目标Celery队列
+            max_backlog: Celery队列中允许积压的最大消息数（按逐文件子任务计），超过时暂停转发
+            pop_timeout: BZPOPMAX阻塞等待秒数
+        """
+        self.app = celery_app
+        self.queue = queue
+        self.key = f"ptvs:pq:{queue}"
+        self.max_backlog = max_backlog
+        self.pop_timeout = pop_timeout
+        self._queue_keys = broker_queue_keys(queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def _client(self):
+        """代理与结果后端共用的Redis客户端"""
+        return self.app.backend.client
+
+    def enqueue(self, sig, priority: int, **options) -> AsyncResult:
+        """
+        将任务签名放入有序集合
+
+        Args:
+            sig: Celery签名（可为group/chord）
+            priority: 任务优先级 (1-10, 10最高)
+            options: 转发时传给apply_async的参数
+
+        Returns:
+            AsyncResult: 预先分配ID的结果句柄
+        """
+        # 预先冻结以分配任务ID，调用方无需等待转发即可跟踪结果
+        result = sig.freeze()
+        options.setdefault('queue', self.queue)
+        options.setdefault('priority', priority)
+        payload = json.dumps(
+            {'sig': dict(sig), 'options': options, 'messages': _message_count(sig)},
+            ensure_ascii=False
+        )
+        score = priority * _PRIORITY_WEIGHT - time.time_ns() // 1_000_000
+        self._client.zadd(self.key, {payload: score})
+        return result
+
+    def pending_count(self) -> int:
+        """有序集合中等待转发的任务数"""
+        return self._client.zcard(self.key)
+
+    def start(self):
+        """启动后台转发线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._dispatch_loop, name=f'priority-scheduler-{self.queue}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止后台转发线程"""
+        self._stop.set()
+
+    def _backlog(self) -> int:
+        """目标Celery队列当前积压的任务数"""
+        pipe = self._client.pipeline(transaction=False)
+        for key in self._queue_keys:
+            pipe.llen(key)
+        return sum(pipe.execute())
+
+    def _dispatch_loop(self):
+        """按分数从高到低取出任务并转发给Celery"""
+        while not self._stop.is_set():
+            try:
+                # Celery队列积压较多时暂停转发，使排序留在有序集合中生效
+                capacity = self.max_backlog - self._backlog()
+                if capacity <= 0:
+                    self._stop.wait(0.05)
+                    continue
+
+                item = self._client.bzpopmax(self.key, timeout=self.pop_timeout)
+                if item is None:
+                    continue
+                _, member, score = item
+                # 按条目发布的消息数扣减余量：首个条目总是转发（否则大批任务永远无法转发），
+                # 余量足够时继续取出后续条目，共用同一个生产者连接发布
+                items = [(member, score)]
+                capacity -= _entry_messages(member)
+                while capacity > 0:
+                    popped = self._client.zpopmax(self.key, 1)
+                    if not popped:
+                        break
+                    member, score = popped[0]
+                    messages = _entry_messages(member)
+                    if messages > capacity:
+                        self._client.zadd(self.key, {member: score})
+                        break
+                    items.append((member, score))
+                    capacity -= messages
+                self._dispatch_many(items)
+            except Exception as e:
+                logger.warning(f"优先级调度器转发失败: {e}")
+                self._stop.wait(1.0)
+
+    def _dispatch_many(self, items):
+        """通过同一个生产者转发一组任务签名，失败时将未转发的条目按原分数放回"""
+        with self.app.producer_or_acquire() as producer:
+            for i, (member, score) in enumerate(items):
+                try:
+                    self._dispatch(member, producer)
+                except Exception:
+                    self._client.zadd(self.key, dict(items[i:]))
+                    raise
+
+    def _dispatch(self, member, producer):
+        """转发单个任务签名"""
+        try:
+            payload: Dict[str, Any] = json.loads(member)
+            sig = signature(payload['sig'], app=self.app)
+        except (ValueError, KeyError, TypeError) as e:
+            # 无法解析的条目直接丢弃，避免反复放回
+            logger.error(f"丢弃无法解析的调度条目: {e}")
+            return
+
+        sig.apply_async(producer=producer, **payload['options'])
@@ -4,43 +4,335 @@
 提供统一的队列管理接口，支持任务优先级和负载均衡
 """
 
+import hashlib
 import logging
+import os
+import threading
 import time
 from typing import Dict, List, Any, Optional, Callable
+import numpy as np
+from cachetools import TTLCache
 from celery import group, chain, chord
 from celery.result import AsyncResult, GroupResult
+from celery.states import READY_STATES
 try:
-    from .celery_app import celery_app
+    from .celery_app import celery_app, broker_queue_keys
 except ImportError:
-    from celery_app import celery_app
+    from celery_app import celery_app, broker_queue_keys
+try:
+    from .priority_scheduler import PriorityScheduler
+except ImportError:
+    from priority_scheduler import PriorityScheduler
 try:
     from .tasks import (
         extract_pdf_content_task,
         process_single_file_task,
         cross_validate_materials_task,
-        batch_process_files_task,
+        finalize_batch_task,
+        get_batch_summary,
         get_task_progress,
-        cleanup_old_task_status
+        stat_files,
+        build_file_canvas,
+        offload_payload
     )
 except ImportError:
     from tasks import (
         extract_pdf_content_task,
         process_single_file_task,
         cross_validate_materials_task,
-        batch_process_files_task,
+        finalize_batch_task,
+        get_batch_summary,
         get_task_progress,
-        cleanup_old_task_status
+        stat_files,
+        build_file_canvas,
+        offload_payload
     )
 
 logger = logging.getLogger(__name__)
 
+# Celery事件类型 -> 任务状态
+_EVENT_STATES = {
+    'task-started': 'STARTED',
+    'task-progress': 'PROGRESS',
+    'task-retried': 'RETRY',
+    'task-succeeded': 'SUCCESS',
+    'task-failed': 'FAILURE',
+    'task-revoked': 'REVOKED',
+}
+_FINISHED_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+# 活动任务记录分片数（2的幂）
+_TASK_SHARDS = 16
+
+# 事件缓存容量：按每个跟踪任务平均的子任务数估算
+_CHILDREN_PER_BATCH = 16
+
+# 任务元数据记录（Redis哈希），供其他进程或重启后查询任务
+_TASK_KEY_PREFIX = 'ptvs:task:'
+
+# 需要统计长度的队列
+_QUEUE_NAMES = ('pdf_extraction', 'file_processing', 'validation')
+
+# 文件大小分档：缺失 / <1MB / 1MB~10MB / >10MB，对应的优先级增量
+_SIZE_BINS = np.array([0, 1024 * 1024, 10 * 1024 * 1024 + 1])
+_SIZE_PRIORITY_DELTAS = np.array([0, 2, 0, -2])
+
 class QueueManager:
     """异步队列管理器"""
     
-    def __init__(self):
+    def __init__(self, max_tracked_tasks: int = 10000, task_ttl: int = 3600):
         self.app = celery_app
-        self._active_tasks = {}
+        self.task_ttl = task_ttl
+        # 活动任务记录：按任务ID分片，每片独立加锁；容量有界，超过task_ttl秒自动过期
+        shard_size = max(1, max_tracked_tasks // _TASK_SHARDS)
+        self._task_shards = [
+            (TTLCache(maxsize=shard_size, ttl=task_ttl), threading.Lock())
+            for _ in range(_TASK_SHARDS)
+        ]
+        
+        # 由事件流维护的任务状态缓存，查询时无需访问Redis；只记录本管理器跟踪的任务
+        # 及其子任务，容量有界并随task_ttl过期，长期运行的进程不会无限增长
+        event_cache_size = max_tracked_tasks * _CHILDREN_PER_BATCH
+        self._status_cache = TTLCache(maxsize=event_cache_size, ttl=task_ttl)
+        self._batch_progress = TTLCache(maxsize=max_tracked_tasks, ttl=task_ttl)  # 批任务ID -> 子任务完成计数
+        self._child_to_batch = TTLCache(maxsize=event_cache_size, ttl=task_ttl)  # 子任务ID -> 批任务ID
+        self._status_lock = threading.Lock()
+        self._event_thread: Optional[threading.Thread] = None
+        
+        # 进行中的PDF提取提交：提交指纹 -> 批任务ID，用于合并重复提交；
+        # 正在发布时为预留标记(threading.Event)，相同提交等待其发布完成
+        self._inflight: Dict[str, Any] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # worker巡检结果短时缓存，避免频繁轮询时反复向所有worker广播
+        self.stats_cache_ttl = 2.0  # 秒
+        self._stats_cache: Optional[tuple] = None  # (monotonic时间, 巡检结果)
+        self._stats_cache_lock = threading.Lock()
+        
+        # 可选：PDF提取经Redis有序集合全局排序后再转发给Celery
+        self._pdf_scheduler: Optional[PriorityScheduler] = None
+        if os.getenv('PTVS_PRIORITY_SCHEDULER', '').lower() in ('1', 'true', 'yes'):
+            self._pdf_scheduler = PriorityScheduler('pdf_extraction')
+            self._pdf_scheduler.start()
+        
+        self._start_event_listener()
+    
+    def _task_shard(self, task_id: str):
+        """任务ID所在的分片 (记录表, 锁)"""
+        return self._task_shards[hash(task_id) & (_TASK_SHARDS - 1)]
+    
+    def _get_task_info(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取活动任务记录，不存在或已过期时返回None"""
+        tasks, lock = self._task_shard(task_id)
+        with lock:
+            return tasks.get(task_id)
+    
+    def _put_task_info(self, task_id: str, task_info: Dict[str, Any], persist: bool = True):
+        """登记活动任务记录，并将元数据写入Redis"""
+        tasks, lock = self._task_shard(task_id)
+        with lock:
+            tasks[task_id] = task_info
+        if persist:
+            self._save_task_meta(task_id, task_info)
+    
+    def _pop_task_info(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """移除并返回活动任务记录，同时删除Redis中的元数据"""
+        tasks, lock = self._task_shard(task_id)
+        with lock:
+            task_info = tasks.pop(task_id, None)
+        try:
+            self.app.backend.client.delete(_TASK_KEY_PREFIX + task_id)
+        except Exception as e:
+            logger.warning(f"删除任务元数据失败 {task_id}: {e}")
+        return task_info
+    
+    def _save_task_meta(self, task_id: str, task_info: Dict[str, Any]):
+        """将可序列化的任务元数据写入Redis哈希，与结果同时过期"""
+        meta = {'type': task_info['type'], 'start_time': task_info['start_time']}
+        for field in ('total_tasks', 'total_files'):
+            if field in task_info:
+                meta[field] = task_info[field]
+        if 'result' in task_info:
+            # chord批任务：保存组ID，其他进程可恢复组结果
+            meta['group_id'] = task_info['result'].id
+        
+        key = _TASK_KEY_PREFIX + task_id
+        try:
+            pipe = self.app.backend.client.pipeline()
+            pipe.hset(key, mapping=meta)
+            pipe.expire(key, self.task_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"保存任务元数据失败 {task_id}: {e}")
+    
+    def _load_task_info(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """读取活动任务记录，本进程未登记时从Redis元数据恢复"""
+        task_info = self._get_task_info(task_id)
+        if task_info is not None:
+            return task_info
         
+        try:
+            meta = {
+                k.decode(): v.decode()
+                for k, v in self.app.backend.client.hgetall(_TASK_KEY_PREFIX + task_id).items()
+            }
+        except Exception as e:
+            logger.warning(f"读取任务元数据失败 {task_id}: {e}")
+            return None
+        if not meta:
+            return None
+        
+        task_info = {
+            'type': meta['type'],
+            'start_time': float(meta['start_time']),
+            'progress_callback': None
+        }
+        for field in ('total_tasks', 'total_files'):
+            if field in meta:
+                task_info[field] = int(meta[field])
+        
+        group_id = meta.get('group_id')
+        if group_id:
+            result = GroupResult.restore(group_id, app=self.app)
+            if result is None:  # 组结果已过期
+                return None
+            task_info['result'] = result
+            task_info['final'] = AsyncResult(task_id, app=self.app)
+        else:
+            task_info['task'] = AsyncResult(task_id, app=self.app)
+        
+        if group_id:
+            # 已结束子任务的事件不会再次到达：从后端读取已完成计数作为初值，
+            # 只登记尚未结束的子任务接收后续事件，避免迟到的事件重复计数
+            pending = []
+            try:
+                completed, failed = self._count_ready_children(result, pending)
+            except Exception as e:
+                logger.warning(f"读取子任务状态失败 {task_id}: {e}")
+                completed = failed = 0
+                pending = [child.id for child in result.children]
+            self._track_batch_children(task_id, pending, completed, failed)
+        self._put_task_info(task_id, task_info, persist=False)
+        return task_info
+    
+    def _tracked_task_ids(self) -> set:
+        """当前未过期的全部活动任务ID（逐片加锁）"""
+        tracked = set()
+        for tasks, lock in self._task_shards:
+            with lock:
+                tasks.expire()
+                tracked.update(tasks.keys())
+        return tracked
+    
+    def _count_task_infos(self) -> int:
+        """当前未过期的活动任务数"""
+        return len(self._tracked_task_ids())
+    
+    def _start_event_listener(self):
+        """启动后台事件监听线程"""
+        self._event_thread = threading.Thread(
+            target=self._event_loop, name='queue-manager-events', daemon=True
+        )
+        self._event_thread.start()
+    
+    def _event_loop(self):
+        """订阅Celery任务事件，连接断开后自动重连"""
+        handlers = {event_type: self._on_task_event for event_type in _EVENT_STATES}
+        while True:
+            try:
+                with self.app.connection_for_read() as connection:
+                    receiver = self.app.events.Receiver(connection, handlers=handlers)
+                    receiver.capture(limit=None, timeout=None, wakeup=True)
+            except Exception as e:
+                logger.warning(f"任务事件监听中断，5秒后重连: {e}")
+                time.sleep(5)
+    
+    def _on_task_event(self, event: Dict[str, Any]):
+        """处理单个任务事件，更新状态缓存与批任务计数"""
+        task_id = event.get('uuid')
+        if not task_id:
+            return
+        
+        status = _EVENT_STATES[event['type']]
+        if status in _FINISHED_STATES:
+            self._release_inflight(task_id)
+        
+        is_tracked = self._get_task_info(task_id) is not None
+        with self._status_lock:
+            # 集群中其他任务的事件不记录
+            if not is_tracked and task_id not in self._child_to_batch:
+                return
+            entry = self._status_cache.setdefault(task_id, {'progress': 0, 'message': ''})
+            entry['status'] = status
+            entry['timestamp'] = event.get('timestamp', time.time())
+            if status == 'PROGRESS':
+                entry['progress'] = event.get('progress', entry['progress'])
+                entry['message'] = event.get('message', entry['message'])
+            elif status in _FINISHED_STATES:
+                entry['progress'] = 100
+                entry['message'] = f"任务状态: {status}"
+                
+                # 汇总到所属批任务
+                batch_id = self._child_to_batch.pop(task_id, None)
+                if batch_id in self._batch_progress:
+                    counts = self._batch_progress[batch_id]
+                    counts['completed'] += 1
+                    if status != 'SUCCESS':
+                        counts['failed'] += 1
+    
+    def _submission_key(self, file_materials: Dict[str, List[str]]) -> str:
+        """计算PDF提取提交的指纹（材料ID、路径、修改时间、大小）"""
+        digest = hashlib.blake2b(digest_size=16)
+        for material_id, file_paths in sorted(file_materials.items()):
+            for file_path in sorted(file_paths):
+                try:
+                    stat = os.stat(file_path)
+                    file_sig = f"{stat.st_mtime_ns}:{stat.st_size}"
+                except OSError:
+                    file_sig = 'missing'
+                digest.update(f"{material_id}\0{file_path}\0{file_sig}\n".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _release_inflight(self, batch_id: str):
+        """批任务结束后移除其提交指纹"""
+        task_info = self._get_task_info(batch_id)
+        key = task_info.get('inflight_key') if task_info else None
+        if key:
+            with self._inflight_lock:
+                if self._inflight.get(key) == batch_id:
+                    del self._inflight[key]
+    
+    def _track_batch_children(self, batch_id: str, child_ids: List[str],
+                              completed: int = 0, failed: int = 0):
+        """登记批任务的子任务，用于事件汇总；恢复的批任务以后端已完成计数为初值"""
+        with self._status_lock:
+            self._batch_progress[batch_id] = {'completed': completed, 'failed': failed}
+            for child_id in child_ids:
+                self._child_to_batch[child_id] = batch_id
+    
+    def _get_cached_status(self, task_id: str, task_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """从事件缓存读取状态，未命中时返回None"""
+        with self._status_lock:
+            counts = self._batch_progress.get(task_id)
+            if counts is not None:
+                total = task_info.get('total_tasks', 0)
+                completed = counts['completed']
+                if not completed:
+                    return None
+                if completed >= total:
+                    status = 'FAILURE' if counts['failed'] else 'SUCCESS'
+                else:
+                    status = 'PROGRESS'
+                progress = int((completed / total) * 100) if total > 0 else 100
+                return {
+                    'status': status,
+                    'progress': progress,
+                    'message': f"已完成 {completed}/{total} 个子任务"
+                }
+            
+            entry = self._status_cache.get(task_id)
+            return dict(entry) if entry is not None else None
+    
     def submit_pdf_extraction_batch(self, 
                                   file_materials: Dict[str, List[str]], 
                                   priority: int = 7,
@@ -56,76 +348,144 @@ class QueueManager:
         Returns:
             str: 批任务ID
         """
-        tasks = []
-        
-        for material_id, file_paths in file_materials.items():
-            for file_path in file_paths:
-                task = extract_pdf_content_task.apply_async(
-                    args=[file_path, material_id],
-                    kwargs={'priority': priority},
-                    priority=priority,
-                    queue='pdf_extraction'
-                )
-                tasks.append(task)
-        
-        # 创建组任务
-        job = group(tasks)
-        result = job.apply_async()
-        
-        # 记录任务组
-        group_id = result.id
-        self._active_tasks[group_id] = {
-            'type': 'pdf_extraction_batch',
-            'tasks': tasks,
+        key = self._submission_key(file_materials)
+        
+        # 锁内只做查重和预留，发布、保存组结果等I/O在锁外进行；
+        # 并发的相同提交等待预留者发布完成后复用其批任务
+        while True:
+            with self._inflight_lock:
+                existing_id = self._inflight.get(key)
+                if existing_id is None:
+                    reservation = self._inflight[key] = threading.Event()
+                    break
+            
+            if isinstance(existing_id, threading.Event):
+                existing_id.wait()
+                continue
+            
+            existing = self._get_task_info(existing_id)
+            if existing is not None and not existing['final'].ready():
+                logger.info(f"相同的PDF提取批任务 {existing_id} 仍在进行，合并本次提交")
+                return existing_id
+            
+            # 已结束的批任务：移除其指纹后重新查重
+            with self._inflight_lock:
+                if self._inflight.get(key) == existing_id:
+                    del self._inflight[key]
+        
+        try:
+            batch_id = self._submit_pdf_extraction_chord(file_materials, priority, progress_callback)
+            self._get_task_info(batch_id)['inflight_key'] = key
+        except Exception:
+            # 发布失败时撤销预留，等待中的相同提交将自行重新提交
+            with self._inflight_lock:
+                if self._inflight.get(key) is reservation:
+                    del self._inflight[key]
+            reservation.set()
+            raise
+        
+        with self._inflight_lock:
+            self._inflight[key] = batch_id
+        reservation.set()
+        return batch_id
+    
+    def _submit_pdf_extraction_chord(self,
+                                     file_materials: Dict[str, List[str]],
+                                     priority: int,
+                                     progress_callback: Optional[Callable]) -> str:
+        """发布PDF提取chord并登记批任务"""
+        signatures = [
+            extract_pdf_content_task.s(file_path, material_id, priority=priority)
+            for material_id, file_paths in file_materials.items()
+            for file_path in file_paths
+        ]
+        
+        # 整组一次性发布到代理，全部完成后由代理触发汇总回调
+        canvas = chord(group(signatures), finalize_batch_task.s('pdf_extraction_batch'))
+        if self._pdf_scheduler is not None:
+            final = self._pdf_scheduler.enqueue(canvas, priority)
+        else:
+            final = canvas.apply_async(queue='pdf_extraction', priority=priority)
+        batch_id = self._register_chord_batch('pdf_extraction_batch', final, progress_callback)
+        
+        logger.info(f"提交PDF提取批任务 {batch_id}，包含 {len(signatures)} 个任务")
+        return batch_id
+    
+    def _register_chord_batch(self,
+                              batch_type: str,
+                              final: AsyncResult,
+                              progress_callback: Optional[Callable],
+                              result: Optional[GroupResult] = None,
+                              **extra) -> str:
+        """
+        登记已发布的chord批任务，以汇总回调的任务ID作为批任务ID
+        
+        分批发布的批任务由调用方提供全部子任务消息的组结果，否则取汇总回调的父结果
+        """
+        if result is None:
+            result = final.parent
+        # 保存组结果，其他进程可通过 GroupResult.restore 恢复
+        result.save()
+        
+        batch_id = final.id
+        self._put_task_info(batch_id, {
+            'type': batch_type,
             'result': result,
+            'final': final,
             'start_time': time.time(),
             'progress_callback': progress_callback,
-            'total_tasks': len(tasks)
-        }
+            'total_tasks': len(result.children),
+            **extra
+        })
         
-        logger.info(f"提交PDF提取批任务 {group_id}，包含 {len(tasks)} 个任务")
-        return group_id
+        self._track_batch_children(batch_id, [child.id for child in result.children])
+        return batch_id
     
     def submit_file_processing_batch(self, 
                                    file_paths: List[str],
-                                   batch_size: int = 5,
+                                   batch_size: int = 1,
                                    priority: int = 5,
-                                   progress_callback: Optional[Callable] = None) -> str:
+                                   progress_callback: Optional[Callable] = None,
+                                   file_sizes: Optional[Dict[str, int]] = None) -> str:
         """
         提交批量文件处理任务
         
         Args:
             file_paths: 文件路径列表
-            batch_size: 批次大小
+            batch_size: 每条消息包含的文件数；默认每个文件一条消息，由空闲worker逐个领取
             priority: 任务优先级
             progress_callback: 进度回调函数
+            file_sizes: 调用方已知的文件大小 {文件路径: 字节数}（如上传时的Content-Length），
+                提供大小的文件不再读取文件状态
         
         Returns:
             str: 批任务ID
         """
+        file_sizes = file_sizes or {}
         # 智能优先级分配
-        prioritized_files = self._assign_file_priorities(file_paths, priority)
-        
-        # 创建批处理任务
-        task = batch_process_files_task.apply_async(
-            args=[file_paths],
-            kwargs={'batch_size': batch_size, 'priority': priority},
-            priority=priority,
-            queue='file_processing'
+        # 未提供大小的文件按目录批量读取状态，优先级计算和子任务共用，子任务不再重复stat
+        file_stats = stat_files([file_path for file_path in file_paths if file_path not in file_sizes])
+        prioritized_files = self._assign_file_priorities(file_paths, priority, file_stats, file_sizes)
+        file_args = [
+            (file_path, file_index, file_priority)
+            for file_index, (file_path, file_priority) in enumerate(prioritized_files, 1)
+        ]
+        
+        # 默认每个文件一条消息，配合prefetch=1由空闲worker逐个领取，慢文件不会拖住其他文件；
+        # 文件数很多时自动合并为分块消息，消息仍过多时分批依次发布
+        canvas, messages = build_file_canvas(
+            file_args, 'file_processing_batch', batch_size, file_stats, priority=priority
         )
+        final = canvas.apply_async()
         
-        # 记录任务
-        task_id = task.id
-        self._active_tasks[task_id] = {
-            'type': 'file_processing_batch',
-            'task': task,
-            'start_time': time.time(),
-            'progress_callback': progress_callback,
-            'total_files': len(file_paths)
-        }
+        batch_id = self._register_chord_batch(
+            'file_processing_batch', final, progress_callback,
+            result=messages, total_files=len(file_paths)
+        )
         
-        logger.info(f"提交文件处理批任务 {task_id}，包含 {len(file_paths)} 个文件")
-        return task_id
+        logger.info(f"提交文件处理批任务 {batch_id}，包含 {len(file_paths)} 个文件，"
+                    f"共 {len(messages.results)} 条消息")
+        return batch_id
     
     def submit_cross_validation(self, 
                               materials_data: Dict,
@@ -144,8 +504,9 @@ class QueueManager:
         Returns:
             str: 任务ID
         """
+        # 大体积材料/规则数据存入Redis，消息中只传引用
         task = cross_validate_materials_task.apply_async(
-            args=[materials_data, rules_data],
+            args=[offload_payload(materials_data), offload_payload(rules_data)],
             kwargs={'priority': priority},
             priority=priority,
             queue='validation'
@@ -153,12 +514,12 @@ class QueueManager:
         
         # 记录任务
         task_id = task.id
-        self._active_tasks[task_id] = {
+        self._put_task_info(task_id, {
             'type': 'cross_validation',
             'task': task,
             'start_time': time.time(),
             'progress_callback': progress_callback
-        }
+        })
         
         logger.info(f"提交交叉验证任务 {task_id}")
         return task_id
@@ -173,24 +534,45 @@ class QueueManager:
         Returns:
             Dict: 任务状态信息
         """
-        if task_id not in self._active_tasks:
+        task_info = self._load_task_info(task_id)
+        if task_info is None:
+            # 元数据已过期的批任务，读取汇总回调写入Redis的完成记录
+            summary = self._get_batch_summary(task_id)
+            if summary is not None:
+                return self._summary_status(task_id, summary)
             return {'status': 'NOT_FOUND', 'message': '任务不存在'}
         
-        task_info = self._active_tasks[task_id]
         task_type = task_info['type']
+        message = ''
         
         try:
-            if task_type.endswith('_batch') and 'result' in task_info:
+            cached = self._get_cached_status(task_id, task_info)
+            if cached is not None and cached['status'] not in _FINISHED_STATES:
+                # 监听线程重连期间或启动前的事件可能丢失：缓存未显示结束时，
+                # 再确认一次后端状态，已结束则改用后端结果
+                if self._backend_finished(task_info):
+                    cached = None
+            if cached is not None:
+                # 事件流已推送状态，O(1)返回
+                status = cached['status']
+                progress = cached['progress']
+                message = cached['message']
+            elif 'final' in task_info and task_info['final'].ready():
+                # 汇总回调已执行，批任务完成
+                status = task_info['final'].status
+                progress = 100
+                message = f"任务状态: {status}"
+            elif task_type.endswith('_batch') and 'result' in task_info:
                 # 组任务状态
                 result = task_info['result']
-                if hasattr(result, 'ready'):
-                    if result.ready():
-                        status = 'SUCCESS' if result.successful() else 'FAILURE'
+                if hasattr(result, 'children'):
+                    # 计算进度：一次MGET读取全部子任务状态，已结束（含失败）的都计入完成数
+                    completed, failed = self._count_ready_children(result)
+                    total = task_info['total_tasks']
+                    if completed >= total:
+                        status = 'FAILURE' if failed else 'SUCCESS'
                         progress = 100
                     else:
-                        # 计算进度
-                        completed = sum(1 for t in task_info['tasks'] if t.ready())
-                        total = task_info['total_tasks']
                         progress = int((completed / total) * 100) if total > 0 else 0
                         status = 'PROGRESS'
                 else:
@@ -200,11 +582,14 @@ class QueueManager:
                 # 单任务状态
                 task = task_info.get('task')
                 if task:
-                    result = AsyncResult(task.id, app=self.app)
-                    status = result.status
+                    # 复用登记时的结果对象，一次读取后端元数据同时得到状态与进度
+                    meta = task.backend.get_task_meta(task.id)
+                    status = meta['status']
                     
-                    # 获取详细进度
-                    task_progress = get_task_progress(task.id)
+                    # 获取详细进度：优先使用update_state写入的进度，其次是Redis进度记录
+                    task_progress = meta.get('result') if status == 'PROGRESS' else None
+                    if not isinstance(task_progress, dict):
+                        task_progress = get_task_progress(task.id)
                     if task_progress:
                         progress = task_progress.get('progress', 0)
                         message = task_progress.get('message', '')
@@ -236,6 +621,58 @@ class QueueManager:
                 'type': task_type
             }
     
+    def _count_ready_children(self, result: GroupResult, pending: Optional[List[str]] = None) -> tuple:
+        """
+        一次MGET读取组内全部子任务的结果元数据
+        
+        Args:
+            result: 组结果
+            pending: 提供时追加尚未结束的子任务ID
+        
+        Returns:
+            tuple: (已结束的子任务数, 其中未成功的子任务数)
+        """
+        backend = self.app.backend
+        children = result.children or []
+        if not children:
+            return 0, 0
+        values = backend.client.mget([backend.get_key_for_task(child.id) for child in children])
+        completed = failed = 0
+        for child, value in zip(children, values):
+            status = backend.decode_result(value)['status'] if value is not None else None
+            if status in READY_STATES:
+                completed += 1
+                if status != 'SUCCESS':
+                    failed += 1
+            elif pending is not None:
+                pending.append(child.id)
+        return completed, failed
+    
+    def _backend_finished(self, task_info: Dict[str, Any]) -> bool:
+        """结果后端中任务（批任务以汇总回调为准）是否已结束"""
+        if 'final' in task_info:
+            return task_info['final'].ready()
+        task = task_info.get('task')
+        return task is not None and task.state in _FINISHED_STATES
+    
+    def _get_batch_summary(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """读取批任务汇总记录，Redis不可用时返回None"""
+        try:
+            return get_batch_summary(batch_id)
+        except Exception as e:
+            logger.warning(f"读取批任务汇总失败 {batch_id}: {e}")
+            return None
+    
+    def _summary_status(self, task_id: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """将批任务汇总记录转换为状态信息"""
+        return {
+            'task_id': task_id,
+            'status': summary.get('status', 'SUCCESS'),
+            'progress': 100,
+            'message': f"已完成 {summary.get('success_count', 0)}/{summary.get('total', 0)} 个子任务",
+            'type': summary.get('type', 'unknown')
+        }
+    
     def get_task_result(self, task_id: str, timeout: int = 30):
         """
         获取任务结果
@@ -247,22 +684,43 @@ class QueueManager:
         Returns:
             任务结果
         """
-        if task_id not in self._active_tasks:
+        task_info = self._load_task_info(task_id)
+        if task_info is None:
             raise ValueError(f"任务 {task_id} 不存在")
         
-        task_info = self._active_tasks[task_id]
-        
+        # Redis结果后端通过pub/sub等待完成通知，interval仅为每次等待的最长阻塞时间
         try:
-            if 'result' in task_info:  # 组任务
+            if 'final' in task_info:  # chord批任务，汇总回调返回全部子任务结果
+                return task_info['final'].get(timeout=timeout, interval=0.05)
+            elif 'result' in task_info:  # 组任务
                 result = task_info['result']
-                return result.get(timeout=timeout)
+                return result.join_native(timeout=timeout, interval=0.01)
             else:  # 单任务
                 task = task_info['task']
-                return task.get(timeout=timeout)
+                return task.get(timeout=timeout, interval=0.05)
         except Exception as e:
             logger.error(f"获取任务结果失败 {task_id}: {e}")
             raise
     
+    def iter_batch_results(self, batch_id: str, timeout: Optional[float] = None):
+        """
+        按完成顺序逐个产出批任务的子任务结果，慢任务不会阻塞已完成结果的读取
+        
+        Args:
+            batch_id: 批任务ID
+            timeout: 等待全部子任务完成的超时时间(秒)
+        
+        Yields:
+            tuple: (子任务ID, 子任务结果)；文件处理批任务的子任务结果为该分块的结果列表
+        """
+        task_info = self._load_task_info(batch_id)
+        if task_info is None or 'result' not in task_info:
+            raise ValueError(f"批任务 {batch_id} 不存在")
+        
+        # Redis结果后端通过pub/sub逐个接收完成通知
+        for child_id, meta in task_info['result'].iter_native(timeout=timeout, interval=0.05):
+            yield child_id, meta.get('result')
+    
     def cancel_task(self, task_id: str) -> bool:
         """
         取消任务
@@ -273,23 +731,23 @@ class QueueManager:
         Returns:
             bool: 是否成功取消
         """
-        if task_id not in self._active_tasks:
+        task_info = self._load_task_info(task_id)
+        if task_info is None:
             return False
         
-        task_info = self._active_tasks[task_id]
-        
         try:
             if 'result' in task_info:  # 组任务
-                result = task_info['result']
-                result.revoke(terminate=True)
-                for task in task_info['tasks']:
-                    task.revoke(terminate=True)
+                # GroupResult.revoke 会撤销全部子任务
+                task_info['result'].revoke(terminate=True)
+                if 'final' in task_info:
+                    task_info['final'].revoke()
             else:  # 单任务
                 task = task_info['task']
                 task.revoke(terminate=True)
             
             # 从活动任务中移除
-            del self._active_tasks[task_id]
+            self._release_inflight(task_id)
+            self._pop_task_info(task_id)
             logger.info(f"任务 {task_id} 已取消")
             return True
             
@@ -300,99 +758,104 @@ class QueueManager:
     def get_queue_stats(self) -> Dict[str, Any]:
         """获取队列统计信息"""
         try:
-            # 获取Celery统计信息
-            stats = self.app.control.inspect().stats()
-            active = self.app.control.inspect().active()
-            scheduled = self.app.control.inspect().scheduled()
+            # 并发的查询在锁上等待并共享同一次巡检结果
+            with self._stats_cache_lock:
+                now = time.monotonic()
+                if self._stats_cache is None or now - self._stats_cache[0] >= self.stats_cache_ttl:
+                    # 获取Celery统计信息（复用同一个Inspect实例）
+                    inspect = self.app.control.inspect(timeout=0.5)
+                    snapshot = {
+                        'celery_stats': inspect.stats(),
+                        'active_workers': inspect.active(),
+                        'scheduled_tasks': inspect.scheduled(),
+                        'queue_lengths': self._get_queue_lengths()
+                    }
+                    self._stats_cache = (now, snapshot)
+                snapshot = self._stats_cache[1]
             
-            return {
-                'active_tasks': len(self._active_tasks),
-                'celery_stats': stats,
-                'active_workers': active,
-                'scheduled_tasks': scheduled,
-                'queue_lengths': self._get_queue_lengths()
-            }
+            return {'active_tasks': self._count_task_infos(), **snapshot}
         except Exception as e:
             logger.error(f"获取队列统计失败: {e}")
             return {'error': str(e)}
     
     def cleanup_completed_tasks(self, max_age: int = 3600):
-        """清理已完成的任务记录"""
+        """清理过期的任务记录（活动任务与Redis进度记录均由TTL自动过期，无需逐个查询完成状态）"""
         current_time = time.time()
-        completed_tasks = []
-        
-        for task_id, task_info in self._active_tasks.items():
-            # 检查任务是否完成
-            try:
-                if 'result' in task_info:  # 组任务
-                    if task_info['result'].ready():
-                        completed_tasks.append(task_id)
-                else:  # 单任务
-                    task = task_info['task']
-                    if task.ready():
-                        completed_tasks.append(task_id)
-                        
-                # 检查任务年龄
-                if current_time - task_info['start_time'] > max_age:
-                    completed_tasks.append(task_id)
-                    
-            except Exception as e:
-                logger.warning(f"检查任务状态失败 {task_id}: {e}")
-                completed_tasks.append(task_id)
-        
-        # 移除已完成的任务
-        for task_id in completed_tasks:
-            if task_id in self._active_tasks:
-                del self._active_tasks[task_id]
         
-        # 清理任务状态缓存
-        cleanup_old_task_status(max_age)
-        
-        logger.info(f"清理了 {len(completed_tasks)} 个已完成的任务")
+        tracked = self._tracked_task_ids()
+        
+        # 移除已过期批任务的提交指纹
+        with self._inflight_lock:
+            stale_keys = [
+                key for key, batch_id in self._inflight.items()
+                if not isinstance(batch_id, threading.Event) and batch_id not in tracked
+            ]
+            for key in stale_keys:
+                del self._inflight[key]
+        
+        # 同步清理事件状态缓存
+        with self._status_lock:
+            expired = [
+                task_id for task_id, entry in self._status_cache.items()
+                if current_time - entry.get('timestamp', 0) > max_age
+            ]
+            for task_id in expired:
+                del self._status_cache[task_id]
+            for batch_id in [b for b in self._batch_progress if b not in tracked]:
+                del self._batch_progress[batch_id]
+            for child_id in [c for c, b in self._child_to_batch.items() if b not in tracked]:
+                del self._child_to_batch[child_id]
+        
+        logger.info(f"清理了 {len(expired)} 条过期任务状态")
     
-    def _assign_file_priorities(self, file_paths: List[str], base_priority: int) -> List[tuple]:
+    def _assign_file_priorities(self, file_paths: List[str], base_priority: int,
+                                file_stats: Optional[Dict[str, os.stat_result]] = None,
+                                file_sizes: Optional[Dict[str, int]] = None) -> List[tuple]:
         """根据文件特征分配优先级"""
-        prioritized_files = []
-        
-        for file_path in file_paths:
-            priority = base_priority
-            
-            try:
-                # 根据文件大小调整优先级
-                if os.path.exists(file_path):
-                    file_size = os.path.getsize(file_path)
-                    
-                    # 小文件提高优先级
-                    if file_size < 1024 * 1024:  # 1MB
-                        priority += 2
-                    # 大文件降低优先级
-                    elif file_size > 10 * 1024 * 1024:  # 10MB
-                        priority -= 2
-                
-                # 根据文件类型调整优先级
-                if file_path.endswith('.pdf'):
-                    priority += 1  # PDF文件稍微提高优先级
-                
-                # 确保优先级在合理范围内
-                priority = max(1, min(10, priority))
-                
-            except Exception as e:
-                logger.warning(f"分配文件优先级失败 {file_path}: {e}")
-            
-            prioritized_files.append((file_path, priority))
-        
-        return prioritized_files
+        if not file_paths:
+            return []
+        
+        file_sizes = file_sizes or {}
+        # 按目录批量读取文件大小，每个目录只扫描一次；调用方已读取或已提供大小时直接复用
+        if file_stats is None:
+            file_stats = stat_files([file_path for file_path in file_paths if file_path not in file_sizes])
+        
+        # 文件不存在记为-1，不调整大小优先级
+        sizes = np.array([
+            file_sizes[file_path] if file_path in file_sizes
+            else file_stats[file_path].st_size if file_path in file_stats
+            else -1
+            for file_path in file_paths
+        ])
+        is_pdf = np.array([file_path.endswith('.pdf') for file_path in file_paths])
+        
+        # 小文件提高优先级，大文件降低优先级，PDF文件稍微提高优先级
+        priorities = (base_priority
+                      + _SIZE_PRIORITY_DELTAS[np.digitize(sizes, _SIZE_BINS)]
+                      + is_pdf)
+        
+        # 确保优先级在合理范围内
+        priorities = np.clip(priorities, 1, 10)
+        
+        return list(zip(file_paths, priorities.tolist()))
     
     def _get_queue_lengths(self) -> Dict[str, int]:
         """获取各队列长度"""
         try:
-            # 这需要Redis连接来查询队列长度
-            # 简化实现，返回占位数据
-            return {
-                'pdf_extraction': 0,
-                'file_processing': 0,
-                'validation': 0
-            }
+            # 直接读取代理Redis中的队列列表长度，一次往返
+            with self.app.connection_for_read() as connection:
+                client = connection.default_channel.client
+                pipe = client.pipeline(transaction=False)
+                # 每个优先级对应一个子列表，合计为队列长度
+                queue_keys = [broker_queue_keys(queue) for queue in _QUEUE_NAMES]
+                for keys in queue_keys:
+                    for key in keys:
+                        pipe.llen(key)
+                lengths = iter(pipe.execute())
+                return {
+                    queue: sum(next(lengths) for _ in keys)
+                    for queue, keys in zip(_QUEUE_NAMES, queue_keys)
+                }
         except Exception as e:
             logger.warning(f"获取队列长度失败: {e}")
             return {}
@@ -7,8 +7,22 @@
 
 import os
 import sys
+from functools import lru_cache
+from importlib.util import find_spec
 from pathlib import Path
 
+from api_keys import NUMBERED_KEY_PATTERN
+
+# 安装包名 -> 导入名（仅列出两者不同的包）
+_IMPORT_NAMES = {
+    'python-dotenv': 'dotenv',
+}
+
+@lru_cache(maxsize=None)
+def module_available(package):
+    """检查包是否已安装（只查找模块位置，不执行导入）"""
+    return find_spec(_IMPORT_NAMES.get(package, package.replace('-', '_'))) is not None
+
 def setup_environment():
     """设置环境和依赖"""
     print("🔧 正在检查系统环境...")
@@ -27,10 +41,9 @@ def setup_environment():
     
     missing_modules = []
     for module in required_modules:
-        try:
-            __import__(module.replace('-', '_'))
+        if module_available(module):
             print(f"✅ {module}")
-        except ImportError:
+        else:
             missing_modules.append(module)
             print(f"❌ {module} - 缺失")
     
@@ -104,15 +117,18 @@ def check_api_keys():
         else:
             api_keys_found.append("GOOGLE_API_KEY: 1 个密钥")
     
-    # 检查分别配置
-    i = 2
-    individual_keys = 0
-    while os.environ.get(f'GOOGLE_API_KEY_{i}'):
-        individual_keys += 1
-        i += 1
+    # 检查分别配置（一次遍历环境变量，编号不连续时也能找到）
+    numbered_keys = sorted(
+        int(match.group(1))
+        for name, value in os.environ.items()
+        if value and (match := NUMBERED_KEY_PATTERN.match(name))
+    )
+    individual_keys = len(numbered_keys)
     
     if individual_keys > 0:
-        api_keys_found.append(f"GOOGLE_API_KEY_2~{i-1}: {individual_keys} 个密钥")
+        api_keys_found.append(
+            f"GOOGLE_API_KEY_{numbered_keys[0]}~{numbered_keys[-1]}: {individual_keys} 个密钥"
+        )
     
     if api_keys_found:
         print("✅ 发现API密钥配置:")
@@ -132,14 +148,13 @@ def check_optional_features():
     print("\n🔍 正在检查可选功能...")
     
     # 检查Redis
-    try:
-        import redis
+    if module_available('redis'):
         redis_url = os.environ.get('REDIS_URL')
         if redis_url:
             print("✅ Redis缓存: 已配置")
         else:
             print("ℹ️ Redis缓存: 未配置（可选）")
-    except ImportError:
+    else:
         print("ℹ️ Redis缓存: 未安装（可选）")
     
     # 检查缓存目录
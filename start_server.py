@@ -11,23 +11,26 @@ import time
 import socket
 import signal
 import platform
-import subprocess
+import ctypes
 from pathlib import Path
 
 def check_port_available(host, port):
-    """检查端口是否可用"""
+    """检查端口是否可用（尝试绑定，被占用时立即返回EADDRINUSE）"""
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(1)
-            result = s.connect_ex((host, port))
-            return result != 0
-    except Exception:
+            # 与Web服务器一致，允许复用TIME_WAIT状态的端口；
+            # Windows下该选项允许抢占正在使用的端口，因此不设置
+            if os.name != 'nt':
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((host, port))
+            return True
+    except OSError:
         return False
 
 def find_available_port(start_port=5000, max_attempts=10):
     """查找可用端口"""
     for port in range(start_port, start_port + max_attempts):
-        if check_port_available('127.0.0.1', port):
+        if check_port_available('0.0.0.0', port):
             return port
     return None
 
@@ -37,15 +40,84 @@ def setup_environment():
     if platform.system() == 'Windows':
         os.environ['PYTHONIOENCODING'] = 'utf-8'
         try:
-            # Windows控制台UTF-8支持
-            subprocess.run(['chcp', '65001'], capture_output=True)
-        except:
+            # Windows控制台UTF-8支持：直接调用控制台API，已是UTF-8时不做任何操作
+            kernel32 = ctypes.windll.kernel32
+            if kernel32.GetConsoleOutputCP() != 65001:
+                kernel32.SetConsoleOutputCP(65001)
+                kernel32.SetConsoleCP(65001)
+        except (AttributeError, OSError):
             pass
     
     # 设置Flask环境
     os.environ.setdefault('FLASK_APP', 'app.py')
     os.environ.setdefault('FLASK_ENV', 'production')
 
+# Flask生产配置，每个工作进程加载应用时应用
+APP_CONFIG = {
+    'TESTING': False,
+    'DEBUG': False,
+    'PROPAGATE_EXCEPTIONS': True,
+    'TRAP_HTTP_EXCEPTIONS': False,
+    'MAX_CONTENT_LENGTH': 200 * 1024 * 1024,  # 200MB
+}
+
+def load_app():
+    """导入Flask应用并应用生产配置"""
+    from app import app
+    app.config.update(APP_CONFIG)
+    return app
+
+def run_waitress(port):
+    """Windows：使用waitress多线程WSGI服务器，未安装时返回False"""
+    try:
+        from waitress import serve
+    except ImportError:
+        return False
+    
+    print("🔧 使用 waitress 服务器")
+    serve(load_app(), host='0.0.0.0', port=port, threads=16,
+          connection_limit=1000, channel_timeout=60)
+    return True
+
+def run_gunicorn(port):
+    """Linux/macOS：使用gunicorn多进程WSGI服务器，未安装时返回False"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return False
+    
+    class StandaloneApplication(BaseApplication):
+        """在当前进程内启动gunicorn，应用在各工作进程中加载"""
+        
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return load_app()
+    
+    # 分析任务在请求进程的后台线程中运行（CPU密集），使用真实线程的gthread工作模式
+    workers = int(os.getenv('WEB_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+    print(f"🔧 使用 gunicorn 服务器 ({workers} 个工作进程)")
+    StandaloneApplication({
+        'bind': f'0.0.0.0:{port}',
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': 16,
+        'timeout': 120,
+        'keepalive': 5,
+    }).run()
+    return True
+
+def run_dev_server(port):
+    """未安装生产服务器时回退到Flask内置服务器"""
+    print("⚠️ 未安装 waitress/gunicorn，使用Flask内置服务器")
+    load_app().run(host='0.0.0.0', port=port, debug=False, threaded=True, use_reloader=False)
+
 def graceful_shutdown(signum, frame):
     """优雅关闭服务器"""
     print(f"\n🛑 接收到关闭信号 {signum}")
@@ -90,35 +162,19 @@ def main():
         # 动态导入以避免循环导入
         sys.path.insert(0, str(script_dir))
         
-        print("📦 加载应用模块...")
-        from app import app
-        
-        print("🔧 配置应用设置...")
-        app.config.update({
-            'TESTING': False,
-            'DEBUG': False,
-            'PROPAGATE_EXCEPTIONS': True,
-            'TRAP_HTTP_EXCEPTIONS': False,
-            'MAX_CONTENT_LENGTH': 200 * 1024 * 1024,  # 200MB
-        })
-        
         print("🌐 启动Web服务器...")
         print(f"   本地访问: http://127.0.0.1:{port}")
         print(f"   局域网访问: http://0.0.0.0:{port}")
         print("   按 Ctrl+C 停止服务器")
         print("=" * 50)
         
-        # 启动服务器
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=False,
-            threaded=True,
-            use_reloader=False,
-            use_debugger=False,
-            use_evalex=False,
-            passthrough_errors=False
-        )
+        # 启动生产WSGI服务器，均不可用时回退到内置服务器
+        if platform.system() == 'Windows':
+            started = run_waitress(port)
+        else:
+            started = run_gunicorn(port)
+        if not started:
+            run_dev_server(port)
         
     except ImportError as e:
         print(f"❌ 导入错误: {e}")
@@ -8,6 +8,32 @@ Celery Worker启动脚本
 import os
 import sys
 import logging
+
+# 工作进程组：all 消费全部队列；heavy 只处理PDF提取和文件处理（低并发）；
+# fast 只处理交叉验证（高并发），使耗时的大PDF不会挤占验证任务
+# 消费PDF/文件处理队列的组使用prefork进程池：这些任务以CPU为主，协程池下软超时
+# 无法中断CPU密集代码，--max-tasks-per-child 也不生效；fast组以I/O为主，可用gevent
+# 用法: python start_worker.py [all|heavy|fast]，或设置环境变量 WORKER_FLEET
+WORKER_FLEETS = {
+    'all': {'queues': 'pdf_extraction,file_processing,validation', 'concurrency': 4, 'prefetch': 1,
+            'pool': 'prefork'},
+    'heavy': {'queues': 'pdf_extraction,file_processing', 'concurrency': 4, 'prefetch': 1,
+              'pool': 'prefork'},
+    'fast': {'queues': 'validation', 'concurrency': 16, 'prefetch': 2, 'pool': 'gevent'},
+}
+WORKER_FLEET = (sys.argv[1] if len(sys.argv) > 1 else os.getenv('WORKER_FLEET', 'all')).lower()
+
+# 非Windows平台上配置为gevent的组使用协程池，未安装gevent时回退到prefork。
+# 猴子补丁必须在导入Celery之前完成
+try:
+    if os.name == 'nt' or WORKER_FLEETS.get(WORKER_FLEET, {}).get('pool') != 'gevent':
+        raise ImportError
+    from gevent import monkey
+    monkey.patch_all()
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
+
 # 【修改1】: 导入Celery的主命令入口，而不是worker子命令
 from celery.bin.celery import celery as celery_main_command
 
@@ -26,6 +52,11 @@ def start_worker():
     # 这一行保留，确保 celery_app 在Python路径中是可导入的
     from celery_app import celery_app
     
+    fleet = WORKER_FLEETS.get(WORKER_FLEET)
+    if fleet is None:
+        print(f"未知的工作进程组: {WORKER_FLEET}，可选: {', '.join(WORKER_FLEETS)}")
+        sys.exit(1)
+    
     # 【修改2】: 重新组织参数列表，模拟正确的命令行结构
     # 全局选项 (-A 或 --app) 必须在子命令 'worker' 之前
     # 使用 -A celery_app 更简洁，Celery会自动寻找app实例
@@ -33,19 +64,26 @@ def start_worker():
         '-A', 'celery_app',
         'worker',
         '--loglevel=info',
-        '--concurrency=4',
-        '--queues=pdf_extraction,file_processing,validation',
-        '--hostname=worker@%h',
+        f"--queues={fleet['queues']}",
+        f"--hostname={'worker' if WORKER_FLEET == 'all' else WORKER_FLEET}@%h",
+        f"--prefetch-multiplier={fleet['prefetch']}",
+        '-Ofair',  # 仅向空闲的子进程分发任务，长任务不会阻塞已预取的任务
         '--max-tasks-per-child=50',
         '--time-limit=600',
         '--soft-time-limit=300',
     ]
     
-    # Windows下需要设置线程池
+    # Windows下需要设置线程池；其他平台按组配置选择，gevent不可用时回退到prefork；
+    # 并发数始终使用组自身的配置
     if os.name == 'nt':
-        worker_args.extend(['--pool=threads'])
+        pool = 'threads'
+    elif GEVENT_AVAILABLE:
+        pool = 'gevent'
+    else:
+        pool = 'prefork'
+    worker_args.extend([f'--pool={pool}', f"--concurrency={fleet['concurrency']}"])
     
-    print("启动Celery Worker...")
+    print(f"启动Celery Worker（{WORKER_FLEET}）...")
     # 为了清晰，我们在打印的参数前加上 'celery'
     print(f"执行命令: celery {' '.join(worker_args)}")
     
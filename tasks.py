@@ -4,43 +4,476 @@ Celery异步任务定义
 包含PDF处理、内容提取、交叉验证等任务
 """
 
-from celery import current_task
-from celery.exceptions import Retry
+from celery import chain, chord, current_task, group
+from celery.result import GroupResult
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from celery.signals import worker_process_init, worker_process_shutdown
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads
 try:
-    from .celery_app import celery_app
+    from .celery_app import celery_app, SERIALIZER, BROKER_VISIBILITY_TIMEOUT
 except ImportError:
     # 直接导入，用于独立运行
-    from celery_app import celery_app
+    from celery_app import celery_app, SERIALIZER, BROKER_VISIBILITY_TIMEOUT
 import logging
 import time
 import os
 from typing import Dict, List, Any, Optional, Tuple
 import threading
+import queue
+import hashlib
+import json
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+# 结果缓存序列化：安装orjson时使用orjson，否则回退到标准json
+try:
+    import orjson
+    
+    def _dumps(value) -> bytes:
+        # 允许整数等非字符串键（与json回退一致，转为字符串键）
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+    _loads = json.loads
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
-# 全局状态管理
-task_status = {}
-status_lock = threading.Lock()
+# 批任务汇总记录（Redis哈希），由结果后端的Redis连接读写
+BATCH_KEY_PREFIX = 'ptvs:batch:'
+BATCH_TTL = 3600  # 秒，与 result_expires 保持一致
+
+# 任务进度记录（Redis哈希），worker写入，Web进程可直接读取
+PROGRESS_KEY_PREFIX = 'ptvs:progress:'
+PROGRESS_TTL = 3600  # 秒，过期后自动清除
+PROGRESS_MIN_INTERVAL = 0.25  # 秒，同一任务两次中间进度上报的最小间隔
+PROGRESS_BATCH_SIZE = 100  # 后台写入线程单次管道最多合并的进度条数
+PROGRESS_FLUSH_WAIT = 0.05  # 秒，后台写入线程凑批的最长等待时间
+PROGRESS_FINAL_WAIT = 2.0  # 秒，结束进度等待后台写入完成的最长时间
+
+# 每个线程最近一次上报的进度 (任务ID, monotonic时间, (进度, 消息))，一个线程同时只执行一个任务
+_progress_local = threading.local()
+
+# 进度写入队列及其后台线程，按进程惰性创建（prefork子进程不继承父进程的线程）
+_progress_queue: Optional[queue.SimpleQueue] = None
+_progress_writer_pid: Optional[int] = None
+_progress_writer_lock = threading.Lock()
+
+# 逐文件处理结果缓存（Redis字符串），文件路径、大小、修改时间均未变时直接复用
+RESULT_CACHE_PREFIX = 'ptvs:pdf:'
+RESULT_CACHE_TTL = 86400  # 秒
+
+# 大体积任务参数（Redis字符串），消息中只传引用，避免经由代理传输数MB数据
+PAYLOAD_KEY_PREFIX = 'ptvs:payload:'
+PAYLOAD_TTL = 3600  # 秒，覆盖排队和重试时间
+PAYLOAD_OFFLOAD_THRESHOLD = 64 * 1024  # 字节，估算体积超过此大小的参数改为传引用
+_PAYLOAD_REF = '__payload_ref__'
+
+# 跨worker进程的分布式锁（Redis SET NX PX），如避免多个worker同时处理同一文件
+LOCK_KEY_PREFIX = 'ptvs:lock:'
+# 仅当锁仍由自己持有时才删除，避免超时后误删其他worker新加的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# 单个批任务同时在代理中的子任务消息数上限：文件更多时合并为分块消息，
+# 仍超过时分批依次发布，避免一次性涌入代理
+MAX_BATCH_MESSAGES = 256
+# 分批发布时各批结果的暂存（Redis哈希：批次序号 -> 结果）
+WAVE_KEY_PREFIX = 'ptvs:wave:'
+
+def _redis_client():
+    """获取结果后端使用的Redis客户端"""
+    return celery_app.backend.client
+
+# CrossValidator实例按进程池化复用：任务执行期间借出、结束后归还。
+# 实例带有逐次处理的状态，同一时刻只由一个任务使用；不能按threading.local缓存，
+# gevent池下threading.local按协程隔离，而每个任务都运行在新协程中
+_validator_pool: List[Any] = []
+_validator_pool_lock = threading.Lock()
+
+def _create_validator():
+    """按环境变量中配置的API密钥创建CrossValidator实例（与Web端加载方式一致）"""
+    try:
+        from .cross_validator import CrossValidator
+        from .api_keys import load_api_keys
+    except ImportError:
+        from cross_validator import CrossValidator
+        from api_keys import load_api_keys
+    
+    api_keys = load_api_keys()
+    if not api_keys:
+        raise ValueError("未配置任何Google API密钥。请在.env文件中设置GOOGLE_API_KEYS（支持逗号、换行分隔）或GOOGLE_API_KEY等")
+    if len(api_keys) > 1:
+        return CrossValidator(api_keys=api_keys)
+    return CrossValidator(api_key=api_keys[0])
+
+@contextmanager
+def checkout_validator():
+    """从本进程的实例池借出CrossValidator，池为空时新建，用完归还"""
+    with _validator_pool_lock:
+        validator = _validator_pool.pop() if _validator_pool else None
+    if validator is None:
+        validator = _create_validator()
+    try:
+        yield validator
+    finally:
+        with _validator_pool_lock:
+            _validator_pool.append(validator)
+
+@worker_process_init.connect
+def _warm_validator(**kwargs):
+    """工作进程启动时预先创建CrossValidator，避免首个任务承担初始化开销"""
+    try:
+        validator = _create_validator()
+        with _validator_pool_lock:
+            _validator_pool.append(validator)
+    except Exception as e:
+        # 初始化失败不影响进程启动，任务执行时会再次尝试并报告错误
+        logger.warning(f"预先初始化CrossValidator失败: {e}")
+
+# 自动重试：瞬时I/O错误（ConnectionError、TimeoutError均为OSError子类）按指数退避加随机抖动重试
+_RETRYABLE_ERRORS = (OSError,)
+# 文件缺失、无权限等错误重试无意义
+_PERMANENT_ERRORS = (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError)
+_RETRY_OPTIONS = {
+    'autoretry_for': _RETRYABLE_ERRORS,
+    'retry_backoff': 2,
+    'retry_backoff_max': 60,
+    'retry_jitter': True,
+    'max_retries': 5,
+}
+
+def _log_task_failure(label: str, exc: BaseException):
+    """
+    记录任务失败：ERROR级别只输出异常摘要，完整堆栈仅在DEBUG级别开启时记录，
+    避免大量失败时格式化堆栈拖慢worker
+    """
+    logger.error("%s: %s", label, exc)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s 堆栈", label, exc_info=exc)
+
+def _should_retry(task, exc: Exception) -> bool:
+    """
+    是否应将异常抛出交给Celery重试
+    
+    任务被直接调用（如在分块任务内逐个执行）时没有可重试的消息，
+    抛出会使整个分块失败，此时返回False，由任务记录该文件的失败结果
+    """
+    return (isinstance(exc, _RETRYABLE_ERRORS)
+            and not isinstance(exc, _PERMANENT_ERRORS)
+            and not task.request.called_directly
+            and task.request.retries < task.max_retries)
+
+def stat_files(file_paths: List[str]) -> Dict[str, os.stat_result]:
+    """
+    批量读取文件状态：按目录分组，每个目录只扫描一次
+    
+    Returns:
+        Dict: {文件路径: stat结果}，不存在的文件不包含在内
+    """
+    # 目录 -> {文件名: [调用方传入的原始路径]}，结果按原始路径返回，
+    # 未规范化的路径（如 d//a.pdf、混用分隔符）也能查到
+    wanted = defaultdict(lambda: defaultdict(list))
+    for file_path in file_paths:
+        directory, name = os.path.split(file_path)
+        wanted[directory][name].append(file_path)
+    
+    stats = {}
+    for directory, names in wanted.items():
+        try:
+            with os.scandir(directory or '.') as entries:
+                for entry in entries:
+                    if entry.name in names and entry.is_file():
+                        stat = entry.stat()
+                        for file_path in names[entry.name]:
+                            stats[file_path] = stat
+        except OSError as e:
+            logger.warning(f"扫描目录失败 {directory}: {e}")
+    return stats
+
+def split_size_hints(file_list: List[Any]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    拆分调用方随文件列表提供的大小提示
+    
+    Args:
+        file_list: 元素为文件路径、(文件路径, 大小) 或 {'path', 'size'}，大小可为None
+    
+    Returns:
+        Tuple: (文件路径列表, {文件路径: 大小})，未提供大小的文件不在字典中
+    """
+    file_paths = []
+    size_hints = {}
+    for entry in file_list:
+        if isinstance(entry, dict):
+            file_path, file_size = entry['path'], entry.get('size')
+        elif isinstance(entry, (list, tuple)):
+            file_path, file_size = entry[0], entry[1] if len(entry) > 1 else None
+        else:
+            file_path, file_size = entry, None
+        file_paths.append(file_path)
+        if file_size is not None:
+            size_hints[file_path] = int(file_size)
+    return file_paths, size_hints
+
+def file_stat_hint(stat: Optional[os.stat_result]) -> Optional[Dict]:
+    """将stat结果压缩为可序列化的子任务参数，无状态时返回None"""
+    if stat is None:
+        return None
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'mtime_ns': stat.st_mtime_ns}
+
+def _path_hash(file_path: str) -> str:
+    """文件路径的定长哈希，用于Redis键名"""
+    return hashlib.blake2b(file_path.encode('utf-8'), digest_size=16).hexdigest()
+
+def _result_cache_key(kind: str, file_path: str, file_stat: Optional[Dict] = None,
+                      file_index: Optional[int] = None) -> Optional[str]:
+    """
+    文件结果缓存键：路径哈希 + 大小 + 修改时间(纳秒)，文件变化后自然失效
+    
+    Args:
+        kind: 结果类型（extract / process），不同任务的结果分开缓存
+        file_path: 文件路径
+        file_stat: 已读取的文件状态 {'size', 'mtime', 'mtime_ns'}，未提供时读取文件状态
+        file_index: 文件序号，处理结果与序号相关时一并计入键
+    
+    Returns:
+        str: 缓存键，文件不可访问时返回None
+    """
+    if file_stat is None or 'mtime_ns' not in file_stat:
+        try:
+            file_stat = file_stat_hint(os.stat(file_path))
+        except OSError:
+            return None
+    key = f"{RESULT_CACHE_PREFIX}{kind}:{_path_hash(file_path)}:{file_stat['size']}:{file_stat['mtime_ns']}"
+    if file_index is not None:
+        key = f"{key}:{file_index}"
+    return key
+
+def _cache_get(key: Optional[str]):
+    """读取结果缓存，未命中或出错时返回None"""
+    if key is None:
+        return None
+    try:
+        cached = _redis_client().get(key)
+        return _loads(cached) if cached is not None else None
+    except Exception as e:
+        logger.warning(f"读取结果缓存失败 {key}: {e}")
+        return None
+
+def _cache_set(key: Optional[str], value):
+    """写入结果缓存，出错时忽略"""
+    if key is None:
+        return
+    try:
+        _redis_client().setex(key, RESULT_CACHE_TTL, _dumps(value))
+    except Exception as e:
+        logger.warning(f"写入结果缓存失败 {key}: {e}")
+
+def _exceeds_size(value: Any, limit: int) -> bool:
+    """粗略估算参数体积（字符串/字节长度之和）是否超过limit，超过即提前返回，不做序列化"""
+    remaining = limit
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (str, bytes)):
+            remaining -= len(item)
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+        else:
+            remaining -= 8
+        if remaining < 0:
+            return True
+    return False
+
+def offload_payload(value: Any) -> Any:
+    """
+    参数较大时存入Redis并返回引用，较小时原样返回
+    
+    大参数使用与Celery消息相同的序列化格式只序列化一次，整数键等行为与直接传参一致
+    
+    Args:
+        value: 任务参数（可序列化对象）
+    
+    Returns:
+        原参数或 {'__payload_ref__': 键名, 'content_type': ..., 'content_encoding': ...}
+    """
+    if not _exceeds_size(value, PAYLOAD_OFFLOAD_THRESHOLD):
+        return value
+    content_type, content_encoding, data = kombu_dumps(value, serializer=SERIALIZER)
+    key = PAYLOAD_KEY_PREFIX + uuid.uuid4().hex
+    _redis_client().setex(key, PAYLOAD_TTL, data)
+    return {_PAYLOAD_REF: key, 'content_type': content_type, 'content_encoding': content_encoding}
+
+def _resolve_payload(value: Any) -> Any:
+    """还原 offload_payload 返回的引用；引用保留到过期，任务重试时仍可读取"""
+    if not (isinstance(value, dict) and _PAYLOAD_REF in value):
+        return value
+    key = value[_PAYLOAD_REF]
+    data = _redis_client().get(key)
+    if data is None:
+        raise ValueError(f"任务参数已过期: {key}")
+    content_type = value['content_type']
+    return kombu_loads(data, content_type, value['content_encoding'], accept=[content_type])
+
+def acquire_lock(key: str, ttl_ms: int = 30000) -> Optional[str]:
+    """
+    获取分布式锁
+    
+    Args:
+        key: 锁键名
+        ttl_ms: 锁自动过期时间（毫秒），持有者异常退出时由过期释放
+    
+    Returns:
+        str: 释放锁所需的令牌，锁已被占用时返回None
+    """
+    token = os.urandom(8).hex()
+    if _redis_client().set(key, token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+def release_lock(key: str, token: str):
+    """释放分布式锁，仅当令牌匹配时删除"""
+    try:
+        _redis_client().eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+    except Exception as e:
+        # 释放失败时锁会在过期后自动释放
+        logger.warning(f"释放分布式锁失败 {key}: {e}")
+
+def _physical_order(stat: Optional[os.stat_result]) -> Tuple[int, int, int]:
+    """文件在磁盘上的大致物理顺序键(设备, inode)，无状态的文件排在最后"""
+    if stat is None:
+        return (1, 0, 0)
+    return (0, stat.st_dev, stat.st_ino)
+
+def _get_progress_queue() -> queue.SimpleQueue:
+    """获取当前进程的进度写入队列，首次调用时启动后台写入线程"""
+    global _progress_queue, _progress_writer_pid
+    pid = os.getpid()
+    if _progress_writer_pid != pid:
+        with _progress_writer_lock:
+            if _progress_writer_pid != pid:
+                _progress_queue = queue.SimpleQueue()
+                threading.Thread(
+                    target=_progress_writer, args=(_progress_queue,),
+                    name='progress-writer', daemon=True
+                ).start()
+                _progress_writer_pid = pid
+    return _progress_queue
+
+def _drain_progress(progress_queue: queue.SimpleQueue, first) -> Dict[str, Tuple]:
+    """
+    从首条进度起凑批：最多 PROGRESS_BATCH_SIZE 个任务或等待 PROGRESS_FLUSH_WAIT 秒，
+    同一任务只保留最新一条；遇到有任务在等待写入完成的进度时立即结束凑批
+    """
+    updates = {first[0]: first}
+    deadline = time.monotonic() + PROGRESS_FLUSH_WAIT
+    while len(updates) < PROGRESS_BATCH_SIZE and first[5] is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = progress_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        updates[item[0]] = item
+        if item[5] is not None:
+            break
+    return updates
+
+def _write_progress(updates: Dict[str, Tuple]):
+    """
+    写入一批进度：进度哈希通过一次Redis管道写入，
+    随后更新结果后端的PROGRESS状态并推送task-progress事件
+    """
+    pipe = _redis_client().pipeline()
+    for task_id, progress, message, timestamp, _, _ in updates.values():
+        key = PROGRESS_KEY_PREFIX + task_id
+        pipe.hset(key, mapping={'progress': progress, 'message': message, 'timestamp': timestamp})
+        pipe.expire(key, PROGRESS_TTL)
+    pipe.execute()
+    
+    backend = celery_app.backend
+    for task_id, progress, message, _, _, _ in updates.values():
+        backend.store_result(task_id, {'progress': progress, 'message': message}, 'PROGRESS')
+    
+    # 推送自定义进度事件，供QueueManager的事件监听线程直接更新状态缓存
+    by_host = defaultdict(list)
+    for item in updates.values():
+        by_host[item[4]].append(item)
+    for hostname, items in by_host.items():
+        with celery_app.events.default_dispatcher(hostname=hostname) as dispatcher:
+            for task_id, progress, message, _, _, _ in items:
+                dispatcher.send('task-progress', uuid=task_id, progress=progress, message=message)
+
+def _write_progress_batch(updates: Dict[str, Tuple]):
+    """写入一批进度并唤醒等待写入完成的任务，写入失败不影响任务本身"""
+    try:
+        _write_progress(updates)
+    except Exception as e:
+        logger.warning(f"写入任务进度失败（{len(updates)} 条）: {e}")
+    finally:
+        for item in updates.values():
+            if item[5] is not None:
+                item[5].set()
+
+def _progress_writer(progress_queue: queue.SimpleQueue):
+    """后台写入线程：阻塞等待进度，凑批后一次写入"""
+    while True:
+        _write_progress_batch(_drain_progress(progress_queue, progress_queue.get()))
+
+@worker_process_shutdown.connect
+def _flush_progress(**kwargs):
+    """工作进程退出前写入队列中剩余的进度"""
+    if _progress_queue is None or _progress_writer_pid != os.getpid():
+        return
+    updates = {}
+    while True:
+        try:
+            item = _progress_queue.get_nowait()
+        except queue.Empty:
+            break
+        updates[item[0]] = item
+    if updates:
+        _write_progress_batch(updates)
 
 def update_task_progress(task_id: str, progress: int, message: str = ""):
     """更新任务进度"""
-    with status_lock:
-        task_status[task_id] = {
-            'progress': progress,
-            'message': message,
-            'timestamp': time.time()
-        }
+    # 任务被直接调用（如在分块任务内执行）时没有任务ID，无需上报
+    if not task_id:
+        return
     
-    # 更新Celery任务状态
-    if current_task:
-        current_task.update_state(
-            state='PROGRESS',
-            meta={'progress': progress, 'message': message}
-        )
+    # 合并过于频繁的中间进度：同一任务250ms内只上报一次，内容未变时不重复上报；
+    # 开始(0)和结束(100)总是上报
+    now = time.monotonic()
+    last = getattr(_progress_local, 'last', None)
+    if last is not None and last[0] == task_id:
+        if last[2] == (progress, message):
+            return
+        if progress not in (0, 100) and now - last[1] < PROGRESS_MIN_INTERVAL:
+            return
+    _progress_local.last = (task_id, now, (progress, message))
+    
+    # 交给后台线程批量写入Redis、结果后端和事件，任务不等待网络往返。
+    # 结束进度(100)例外：等待写入完成后再返回，避免滞后的PROGRESS状态
+    # 覆盖Celery随后写入的最终状态
+    hostname = current_task.request.hostname if current_task else None
+    done = threading.Event() if progress == 100 else None
+    _get_progress_queue().put_nowait((task_id, progress, message, time.time(), hostname, done))
+    if done is not None:
+        done.wait(PROGRESS_FINAL_WAIT)
 
-@celery_app.task(bind=True, name='pdf_processor.tasks.extract_pdf_content')
+@celery_app.task(bind=True, name='pdf_processor.tasks.extract_pdf_content',
+                 soft_time_limit=240, time_limit=300, **_RETRY_OPTIONS)
 def extract_pdf_content_task(self, file_path: str, material_id: str, priority: int = 5):
     """
     异步PDF内容提取任务
@@ -58,16 +491,18 @@ def extract_pdf_content_task(self, file_path: str, material_id: str, priority: i
     try:
         update_task_progress(task_id, 0, f"开始处理PDF文件: {os.path.basename(file_path)}")
         
-        # 导入cross_validator来使用现有的PDF处理逻辑
-        from .cross_validator import CrossValidator
-        
-        # 创建一个临时的CrossValidator实例
-        validator = CrossValidator()
-        
-        update_task_progress(task_id, 20, "初始化PDF处理器")
+        # 同一文件未变化时直接复用上次提取的内容
+        cache_key = _result_cache_key('extract', file_path)
+        content = _cache_get(cache_key)
         
-        # 使用现有的PDF提取方法
-        content = validator._extract_pdf_content_enhanced(file_path)
+        if content is None:
+            # 复用本进程已初始化的CrossValidator实例
+            with checkout_validator() as validator:
+                update_task_progress(task_id, 20, "初始化PDF处理器")
+                
+                # 使用现有的PDF提取方法
+                content = validator._extract_pdf_content_enhanced(file_path)
+            _cache_set(cache_key, content)
         
         update_task_progress(task_id, 80, "PDF内容提取完成")
         
@@ -82,9 +517,28 @@ def extract_pdf_content_task(self, file_path: str, material_id: str, priority: i
         update_task_progress(task_id, 100, "任务完成")
         return result
         
+    except SoftTimeLimitExceeded:
+        # 软超时：在硬超时终止进程前记录失败结果，释放worker
+        error_msg = f"PDF提取超时（超过 {self.soft_time_limit} 秒）"
+        logger.error(error_msg)
+        
+        result = {
+            'material_id': material_id,
+            'file_path': file_path,
+            'content': None,
+            'success': False,
+            'error': error_msg
+        }
+        
+        update_task_progress(task_id, 100, f"任务失败: {error_msg}")
+        return result
+        
     except Exception as e:
-        error_msg = f"PDF提取失败: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        # 瞬时I/O错误交给Celery指数退避重试，其余错误或重试用尽时返回失败结果
+        if _should_retry(self, e):
+            raise
+        _log_task_failure("PDF提取失败", e)
+        error_msg = f"PDF提取失败: {e}"
         
         result = {
             'material_id': material_id,
@@ -97,8 +551,10 @@ def extract_pdf_content_task(self, file_path: str, material_id: str, priority: i
         update_task_progress(task_id, 100, f"任务失败: {error_msg}")
         return result
 
-@celery_app.task(bind=True, name='pdf_processor.tasks.process_single_file')
-def process_single_file_task(self, file_path: str, file_index: int, priority: int = 5):
+@celery_app.task(bind=True, name='pdf_processor.tasks.process_single_file',
+                 soft_time_limit=240, time_limit=300, **_RETRY_OPTIONS)
+def process_single_file_task(self, file_path: str, file_index: int, priority: int = 5,
+                             file_stat: Optional[Dict] = None):
     """
     异步单文件处理任务
     
@@ -106,29 +562,69 @@ def process_single_file_task(self, file_path: str, file_index: int, priority: in
         file_path: 文件路径
         file_index: 文件索引
         priority: 任务优先级
+        file_stat: 父任务已读取的文件状态 {'size', 'mtime', 'mtime_ns'}，提供时计算结果缓存键不再重复stat
     
     Returns:
         Dict: 处理结果
     """
     task_id = self.request.id
+    lock_key = LOCK_KEY_PREFIX + _path_hash(file_path)
+    lock_token = None
     
     try:
         update_task_progress(task_id, 0, f"开始处理文件: {os.path.basename(file_path)}")
         
-        from .cross_validator import CrossValidator
-        validator = CrossValidator()
+        # 同一文件未变化时直接复用上次的处理结果
+        cache_key = _result_cache_key('process', file_path, file_stat, file_index)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            update_task_progress(task_id, 100, "文件处理完成（缓存）")
+            return cached
         
-        update_task_progress(task_id, 20, "分析文件类型")
+        # 同一文件同时只由一个worker处理；锁的有效期覆盖任务硬超时
+        lock_token = acquire_lock(lock_key, ttl_ms=int((self.time_limit or 300) * 1000))
+        if lock_token is None:
+            update_task_progress(task_id, 100, "文件正在由其他任务处理，已跳过")
+            return {
+                'file_path': file_path,
+                'success': False,
+                'skipped': True,
+                'error': "文件正在由其他任务处理"
+            }
         
-        # 使用现有的文件处理逻辑
-        result = validator._process_single_file_enhanced(file_path, file_index)
+        with checkout_validator() as validator:
+            update_task_progress(task_id, 20, "分析文件类型")
+            
+            # 使用现有的文件处理逻辑
+            result = validator._process_single_file_enhanced(file_path, file_index)
+        # 只缓存成功的结果，失败的文件下次重新处理
+        if isinstance(result, dict) and result.get('success'):
+            _cache_set(cache_key, result)
         
         update_task_progress(task_id, 100, "文件处理完成")
         return result
         
+    except SoftTimeLimitExceeded:
+        # 软超时：在硬超时终止进程前记录失败结果，释放worker
+        error_msg = f"文件处理超时（超过 {self.soft_time_limit} 秒）"
+        logger.error(error_msg)
+        
+        result = {
+            'file_path': file_path,
+            'success': False,
+            'error': error_msg,
+            'timed_out': True
+        }
+        
+        update_task_progress(task_id, 100, f"任务失败: {error_msg}")
+        return result
+        
     except Exception as e:
-        error_msg = f"文件处理失败: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        # 瞬时I/O错误交给Celery指数退避重试，其余错误或重试用尽时返回失败结果
+        if _should_retry(self, e):
+            raise
+        _log_task_failure("文件处理失败", e)
+        error_msg = f"文件处理失败: {e}"
         
         result = {
             'file_path': file_path,
@@ -138,15 +634,20 @@ def process_single_file_task(self, file_path: str, file_index: int, priority: in
         
         update_task_progress(task_id, 100, f"任务失败: {error_msg}")
         return result
+    
+    finally:
+        if lock_token is not None:
+            release_lock(lock_key, lock_token)
 
-@celery_app.task(bind=True, name='pdf_processor.tasks.cross_validate_materials')
+@celery_app.task(bind=True, name='pdf_processor.tasks.cross_validate_materials',
+                 soft_time_limit=120, time_limit=180, **_RETRY_OPTIONS)
 def cross_validate_materials_task(self, materials_data: Dict, rules_data: Dict, priority: int = 3):
     """
     异步交叉验证任务
     
     Args:
-        materials_data: 材料数据
-        rules_data: 规则数据
+        materials_data: 材料数据，或 offload_payload 返回的引用
+        rules_data: 规则数据，或 offload_payload 返回的引用
         priority: 任务优先级
     
     Returns:
@@ -157,18 +658,19 @@ def cross_validate_materials_task(self, materials_data: Dict, rules_data: Dict,
     try:
         update_task_progress(task_id, 0, "开始交叉验证分析")
         
-        from .cross_validator import CrossValidator
-        validator = CrossValidator()
-        
-        update_task_progress(task_id, 20, "加载验证规则")
+        materials_data = _resolve_payload(materials_data)
+        rules_data = _resolve_payload(rules_data)
         
-        # 执行交叉验证逻辑
-        validation_results = validator._perform_cross_validation(materials_data, rules_data)
-        
-        update_task_progress(task_id, 80, "生成验证报告")
-        
-        # 生成最终报告
-        report = validator._generate_validation_report(validation_results)
+        with checkout_validator() as validator:
+            update_task_progress(task_id, 20, "加载验证规则")
+            
+            # 执行交叉验证逻辑
+            validation_results = validator._perform_cross_validation(materials_data, rules_data)
+            
+            update_task_progress(task_id, 80, "生成验证报告")
+            
+            # 生成最终报告
+            report = validator._generate_validation_report(validation_results)
         
         result = {
             'validation_results': validation_results,
@@ -180,9 +682,27 @@ def cross_validate_materials_task(self, materials_data: Dict, rules_data: Dict,
         update_task_progress(task_id, 100, "交叉验证完成")
         return result
         
+    except SoftTimeLimitExceeded:
+        # 软超时：在硬超时终止进程前记录失败结果，释放worker
+        error_msg = f"交叉验证超时（超过 {self.soft_time_limit} 秒）"
+        logger.error(error_msg)
+        
+        result = {
+            'validation_results': None,
+            'report': None,
+            'success': False,
+            'error': error_msg
+        }
+        
+        update_task_progress(task_id, 100, f"任务失败: {error_msg}")
+        return result
+        
     except Exception as e:
-        error_msg = f"交叉验证失败: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        # 瞬时I/O错误交给Celery指数退避重试，其余错误或重试用尽时返回失败结果
+        if _should_retry(self, e):
+            raise
+        _log_task_failure("交叉验证失败", e)
+        error_msg = f"交叉验证失败: {e}"
         
         result = {
             'validation_results': None,
@@ -194,92 +714,280 @@ def cross_validate_materials_task(self, materials_data: Dict, rules_data: Dict,
         update_task_progress(task_id, 100, f"任务失败: {error_msg}")
         return result
 
-@celery_app.task(bind=True, name='pdf_processor.tasks.batch_process_files')
-def batch_process_files_task(self, file_list: List[str], batch_size: int = 5, priority: int = 5):
+@celery_app.task(bind=True, name='pdf_processor.tasks.process_file_chunk')
+def process_file_chunk_task(self, file_args: List[List]):
+    """
+    分块文件处理任务：块内文件依次处理
+    
+    分块的时限按文件数放大；软超时触发后不再处理块内剩余文件，直接记录为失败，
+    避免继续运行到硬超时导致整块结果丢失
+    
+    Args:
+        file_args: [(文件路径, 文件序号, 优先级, 文件状态)]
+    
+    Returns:
+        List: 逐文件处理结果
+    """
+    results = []
+    for position, args in enumerate(file_args):
+        try:
+            result = process_single_file_task(*args)
+        except SoftTimeLimitExceeded:
+            result = {'file_path': args[0], 'success': False, 'error': "分块处理超时", 'timed_out': True}
+        results.append(result)
+        
+        if isinstance(result, dict) and result.get('timed_out'):
+            remaining = file_args[position + 1:]
+            logger.error("分块处理超时，%d 个文件未处理", len(remaining))
+            results.extend(
+                {'file_path': rest[0], 'success': False, 'error': "分块处理超时，文件未处理"}
+                for rest in remaining
+            )
+            break
+    return results
+
+@celery_app.task(bind=True, name='pdf_processor.tasks.collect_wave')
+def collect_wave_task(self, results: List, wave_key: str, wave_index: int):
+    """分批发布时单批子任务的汇总回调：将本批结果暂存到Redis，由最终回调按批次顺序合并"""
+    pipe = _redis_client().pipeline()
+    pipe.hset(wave_key, wave_index, _dumps(results))
+    pipe.expire(wave_key, BATCH_TTL)
+    pipe.execute()
+
+@celery_app.task(bind=True, name='pdf_processor.tasks.finalize_waves')
+def finalize_waves_task(self, wave_key: str, wave_count: int, batch_type: str,
+                        order: Optional[List[int]] = None):
+    """分批发布的批任务最终回调：按批次顺序合并各批结果后汇总"""
+    waves = {int(k): v for k, v in _redis_client().hgetall(wave_key).items()}
+    results = []
+    for wave_index in range(wave_count):
+        results.extend(_loads(waves[wave_index]) if wave_index in waves else [])
+    _redis_client().delete(wave_key)
+    return _finalize_batch(self.request.id, results, batch_type, order)
+
+def _file_messages(file_args: List[Tuple[str, int, int]], batch_size: int,
+                   file_stats: Dict[str, os.stat_result]) -> list:
+    """构建逐文件或分块的子任务签名列表"""
+    # acks_late下消息在硬超时前必须完成确认，否则会被代理重新投递给其他worker；
+    # 预留一半可见性超时给排队等待，据此限制单块文件数
+    hard_limit = process_single_file_task.time_limit
+    max_chunk_files = max(1, (BROKER_VISIBILITY_TIMEOUT // 2) // hard_limit)
+    batch_size = max(1, batch_size, -(-len(file_args) // MAX_BATCH_MESSAGES))
+    batch_size = min(batch_size, max_chunk_files)
+    
+    if batch_size == 1:
+        return [
+            process_single_file_task.s(
+                file_path, file_index, priority=file_priority,
+                file_stat=file_stat_hint(file_stats.get(file_path))
+            ).set(queue='file_processing', priority=file_priority)
+            for file_path, file_index, file_priority in file_args
+        ]
+    
+    # 按batch_size分块，每块一条消息，可由多个worker并行领取；
+    # 消息优先级取块内文件的最高优先级，时限按块内文件数放大
+    soft_limit = process_single_file_task.soft_time_limit
+    messages = []
+    for i in range(0, len(file_args), batch_size):
+        chunk = [
+            (file_path, file_index, file_priority, file_stat_hint(file_stats.get(file_path)))
+            for file_path, file_index, file_priority in file_args[i:i + batch_size]
+        ]
+        messages.append(
+            process_file_chunk_task.s(chunk).set(
+                queue='file_processing',
+                priority=max(args[2] for args in chunk),
+                soft_time_limit=soft_limit * len(chunk),
+                time_limit=hard_limit * len(chunk)
+            )
+        )
+    return messages
+
+def build_file_canvas(file_args: List[Tuple[str, int, int]], batch_type: str,
+                      batch_size: int = 1,
+                      file_stats: Optional[Dict[str, os.stat_result]] = None,
+                      order: Optional[List[int]] = None,
+                      priority: Optional[int] = None) -> Tuple[Any, GroupResult]:
+    """
+    构建批量文件处理的任务流程
+    
+    默认每个文件一条消息；文件较多时合并为分块消息（单块文件数受可见性超时限制）。
+    消息数不超过 MAX_BATCH_MESSAGES 时整体发布为一个chord；超过时按 MAX_BATCH_MESSAGES
+    分批依次发布，上一批全部完成后才发布下一批，使代理中同一批任务的消息数有上限
+    
+    Args:
+        file_args: [(文件路径, 文件序号, 优先级)]
+        batch_type: 批任务类型
+        batch_size: 每条消息至少包含的文件数
+        file_stats: 已读取的文件状态 {文件路径: stat结果}，随子任务下发以免重复stat
+        order: 子任务发布顺序对应的原始文件位置
+        priority: 汇总回调的优先级
+    
+    Returns:
+        Tuple: (任务流程签名, 全部子任务消息的组结果)
+    """
+    messages = _file_messages(file_args, batch_size, file_stats or {})
+    # 预先冻结以分配任务ID，调用方可据此跟踪进度
+    group_result = GroupResult(uuid.uuid4().hex, [sig.freeze() for sig in messages], app=celery_app)
+    
+    if len(messages) <= MAX_BATCH_MESSAGES:
+        # group在同一个生产者连接上一次性发布全部子任务，无需逐个apply_async
+        body = finalize_batch_task.s(batch_type, order=order)
+        if priority is not None:
+            body.set(priority=priority)
+        return chord(group(messages), body), group_result
+    
+    wave_key = WAVE_KEY_PREFIX + uuid.uuid4().hex
+    waves = [messages[i:i + MAX_BATCH_MESSAGES] for i in range(0, len(messages), MAX_BATCH_MESSAGES)]
+    # 各批子任务设为不可变，不接收上一批回调的返回值
+    links = [
+        chord(group([sig.set(immutable=True) for sig in wave]),
+              collect_wave_task.s(wave_key, wave_index))
+        for wave_index, wave in enumerate(waves)
+    ]
+    body = finalize_waves_task.si(wave_key, len(waves), batch_type, order=order)
+    if priority is not None:
+        body.set(priority=priority)
+    return chain(*links, body), group_result
+
+@celery_app.task(bind=True, name='pdf_processor.tasks.batch_process_files', **_RETRY_OPTIONS)
+def batch_process_files_task(self, file_list: List[Any], batch_size: int = 5, priority: int = 5,
+                             file_priorities: Optional[List[int]] = None):
     """
     批量文件处理任务 - 支持更好的负载均衡
     
+    将全部文件一次性发布为chord并以其替换当前任务：本任务立即结束、释放worker，
+    子任务全部完成后由汇总回调生成结果，结果仍记录在本任务ID下
+    
     Args:
-        file_list: 文件列表
-        batch_size: 批次大小
+        file_list: 文件列表，元素为文件路径、(文件路径, 大小) 或 {'path', 'size'}；
+            提供大小的文件不再读取文件状态（也不参与物理顺序排序）
+        batch_size: 保留参数，子任务由worker按预取设置自行领取，不再分批等待；
+            文件数超过 MAX_BATCH_MESSAGES 时自动合并为分块消息
         priority: 任务优先级
+        file_priorities: 调用方预先计算的逐文件优先级，提供时不再读取文件大小
     
     Returns:
         List: 处理结果列表
     """
     task_id = self.request.id
+    total_files = len(file_list)
+    
+    if not total_files:
+        return []
     
     try:
-        total_files = len(file_list)
         update_task_progress(task_id, 0, f"开始批量处理 {total_files} 个文件")
         
-        results = []
+        file_list, size_hints = split_size_hints(file_list)
         
-        # 分批处理文件
-        for i in range(0, total_files, batch_size):
-            batch = file_list[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (total_files + batch_size - 1) // batch_size
-            
-            update_task_progress(
-                task_id, 
-                int((i / total_files) * 100), 
-                f"处理批次 {batch_num}/{total_batches} ({len(batch)} 个文件)"
-            )
-            
-            # 为当前批次创建子任务
-            batch_tasks = []
-            for j, file_path in enumerate(batch):
-                # 根据文件大小和类型调整优先级
-                file_priority = priority
-                if file_path.endswith('.pdf'):
-                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                    # 大文件降低优先级
-                    if file_size > 10 * 1024 * 1024:  # 10MB
-                        file_priority = max(1, priority - 2)
-                
-                task = process_single_file_task.apply_async(
-                    args=[file_path, i + j + 1],
-                    kwargs={'priority': file_priority},
-                    priority=file_priority
-                )
-                batch_tasks.append(task)
-            
-            # 等待当前批次完成
-            batch_results = []
-            for task in batch_tasks:
-                try:
-                    result = task.get(timeout=300)  # 5分钟超时
-                    batch_results.append(result)
-                except Exception as e:
-                    batch_results.append({
-                        'success': False,
-                        'error': f"子任务执行失败: {str(e)}"
-                    })
+        # 调用方未提供大小的文件按目录批量读取状态，同时用于大小优先级和物理顺序排序
+        file_stats = stat_files([file_path for file_path in file_list if file_path not in size_hints])
+        
+        file_args = []
+        for index, file_path in enumerate(file_list):
+            # 根据文件大小和类型调整优先级
+            file_priority = priority
+            if file_priorities is not None:
+                file_priority = file_priorities[index]
+            elif file_path.endswith('.pdf'):
+                file_size = size_hints.get(file_path)
+                if file_size is None and file_path in file_stats:
+                    file_size = file_stats[file_path].st_size
+                # 大文件降低优先级
+                if file_size is not None and file_size > 10 * 1024 * 1024:  # 10MB
+                    file_priority = max(1, priority - 2)
             
-            results.extend(batch_results)
+            file_args.append((file_path, index + 1, file_priority))
+        
+        # 按(设备, inode)排序发布，使文件大致按磁盘物理顺序读取，利于预读；
+        # 文件序号保持原值，读取失败的文件排在最后
+        file_args.sort(key=lambda args: _physical_order(file_stats.get(args[0])))
+        order = [file_index - 1 for _, file_index, _ in file_args]
         
-        update_task_progress(task_id, 100, f"批量处理完成，共处理 {len(results)} 个文件")
-        return results
+        job, messages = build_file_canvas(
+            file_args, 'file_processing_batch', file_stats=file_stats, order=order
+        )
         
     except Exception as e:
-        error_msg = f"批量处理失败: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        update_task_progress(task_id, 100, f"任务失败: {error_msg}")
+        # 瞬时I/O错误由Celery重试，此时不记录失败
+        if not _should_retry(self, e):
+            _log_task_failure("批量处理失败", e)
+            error_msg = f"批量处理失败: {e}"
+            update_task_progress(task_id, 100, f"任务失败: {error_msg}")
         raise
+    
+    update_task_progress(task_id, 10, f"已发布 {total_files} 个文件（{len(messages.results)} 条消息）")
+    # replace 通过抛出 Ignore 结束当前任务，必须在 try 之外调用
+    raise self.replace(job)
+
+@celery_app.task(bind=True, name='pdf_processor.tasks.finalize_batch')
+def finalize_batch_task(self, results: List[Dict], batch_type: str,
+                        order: Optional[List[int]] = None):
+    """
+    批任务汇总回调（chord body），所有子任务完成后由代理触发
+    
+    Args:
+        results: 子任务结果列表
+        batch_type: 批任务类型
+        order: 子任务发布顺序对应的原始文件位置，提供时按原始顺序还原结果
+    
+    Returns:
+        List: 逐文件的子任务结果，作为整个批任务的结果
+    """
+    return _finalize_batch(self.request.id, results, batch_type, order)
+
+def _finalize_batch(batch_id: str, results: List, batch_type: str,
+                    order: Optional[List[int]] = None) -> List:
+    """展开分块结果、还原原始顺序并写入批任务汇总记录"""
+    # 分块子任务返回结果列表，展开为逐文件结果
+    results = [item for r in results for item in (r if isinstance(r, list) else [r])]
+    if order is not None and len(order) == len(results):
+        ordered = [None] * len(results)
+        for position, result in zip(order, results):
+            ordered[position] = result
+        results = ordered
+    total = len(results)
+    success_count = sum(1 for r in results if isinstance(r, dict) and r.get('success'))
+    
+    key = BATCH_KEY_PREFIX + batch_id
+    pipe = _redis_client().pipeline()
+    pipe.hset(key, mapping={
+        'type': batch_type,
+        'status': 'SUCCESS',
+        'total': total,
+        'success_count': success_count,
+        'failed_count': total - success_count,
+        'finished_at': time.time()
+    })
+    pipe.expire(key, BATCH_TTL)
+    pipe.execute()
+    
+    logger.info(f"批任务 {batch_id} 完成: {success_count}/{total} 成功")
+    return results
+
+def _decode_hash(record: Dict) -> Dict[str, str]:
+    """将Redis哈希的字节键值解码为字符串"""
+    return {
+        (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+        for k, v in record.items()
+    }
+
+def get_batch_summary(batch_id: str) -> Optional[Dict]:
+    """获取已完成批任务的汇总记录，不存在时返回None"""
+    summary = _redis_client().hgetall(BATCH_KEY_PREFIX + batch_id)
+    if not summary:
+        return None
+    return _decode_hash(summary)
 
 def get_task_progress(task_id: str) -> Optional[Dict]:
-    """获取任务进度"""
-    with status_lock:
-        return task_status.get(task_id)
-
-def cleanup_old_task_status(max_age: int = 3600):
-    """清理旧的任务状态记录"""
-    current_time = time.time()
-    with status_lock:
-        expired_tasks = [
-            task_id for task_id, status in task_status.items()
-            if current_time - status.get('timestamp', 0) > max_age
-        ]
-        for task_id in expired_tasks:
-            del task_status[task_id]
\ No newline at end of file
+    """获取任务进度，不存在时返回None"""
+    record = _redis_client().hgetall(PROGRESS_KEY_PREFIX + task_id)
+    if not record:
+        return None
+    record = _decode_hash(record)
+    return {
+        'progress': int(record.get('progress', 0)),
+        'message': record.get('message', ''),
+        'timestamp': float(record.get('timestamp', 0))
+    }